@@ -1,14 +1,18 @@
 from sqlalchemy.orm import Session
 from .models import User
+from .phones import normalize_phone
+from .logs import get_logger
 from .utils import hash_password, verify_password  # Updated import
 
+logger = get_logger("auth")
+
 def register_user(db: Session, fullname: str, phone: str, email: str, password: str):
     hashed_password = hash_password(password)  # Uses bcrypt now
-    print("🔐 Hashed password (bcrypt):", hashed_password)
     
     user = User(
         fullname=fullname,
         phone=phone,
+        phone_e164=normalize_phone(phone),
         email=email,
         hashed_password=hashed_password
     )
@@ -22,13 +26,10 @@ def login_user(db: Session, email: str, password: str):
     if not user:
         return None
 
-    print("LOGIN 🔍 Input password:", password)
-    print("LOGIN 🔐 Password in DB:", user.hashed_password)
-
     # Use verify_password instead of direct comparison
     if not verify_password(password, user.hashed_password):
-        print("LOGIN ❌ Passwords didn't match")
+        logger.info("Login failed: password mismatch", extra={"route": "login_user", "user_id": user.id})
         return None
 
-    print("LOGIN ✅ Passwords matched")
+    logger.info("Login succeeded", extra={"route": "login_user", "user_id": user.id})
     return user
\ No newline at end of file
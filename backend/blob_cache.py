@@ -0,0 +1,245 @@
+"""Memory-mapped cache for hot static blobs (templates and derived line art).
+
+BlobCacheMiddleware sits outside every other middleware and answers GET/HEAD
+for cached files under /static/templates and /static/derived straight from a
+read-only mmap, with headers computed once at admission. Anything it does not
+hold falls through to the normal stack (auth checks, StaticFiles).
+
+The mappings are MAP_SHARED views of the page cache, so every worker on the
+host serves the same physical copy and a hit does no read() at all; the
+memoryview is handed to the server, which writes it to the socket without
+copying it into a bytes object first.
+
+- admission: a file is mapped once it has been requested BLOB_CACHE_ADMIT_AFTER
+  times and is at most BLOB_CACHE_MAX_FILE_BYTES
+- eviction: least recently used first, keeping the mapped total under
+  BLOB_CACHE_MAX_BYTES (0 disables the cache)
+- freshness: entries are re-stat()ed at most every BLOB_CACHE_REVALIDATE_SECONDS
+  and templates are dropped whenever the catalog changes
+
+Writers must replace files (write a temp file, os.replace) rather than
+rewrite them in place; truncating a mapped file faults the readers.
+Counters are per worker; stats() feeds /admin/blob-cache.
+"""
+import hashlib
+import mimetypes
+import mmap
+import os
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate
+from typing import Callable, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+from backend import cache_bus, catalog
+from backend.logs import get_logger
+
+logger = get_logger("blob_cache")
+
+MAX_BYTES = int(os.getenv("BLOB_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+MAX_FILE_BYTES = int(os.getenv("BLOB_CACHE_MAX_FILE_BYTES", str(8 * 1024 * 1024)))
+ADMIT_AFTER = int(os.getenv("BLOB_CACHE_ADMIT_AFTER", "2"))
+REVALIDATE_SECONDS = float(os.getenv("BLOB_CACHE_REVALIDATE_SECONDS", "2"))
+PREFIXES = ("templates/", "derived/")
+URL_PREFIX = catalog.URL_PREFIX + "/"
+_SEEN_LIMIT = 4096  # request counts kept for files not yet admitted
+
+
+class Blob:
+    __slots__ = ("path", "view", "size", "identity", "etag", "last_modified", "headers",
+                 "not_modified_headers", "checked_at", "_map")
+
+    def __init__(self, path: str, full_path: str):
+        with open(full_path, "rb") as f:
+            st = os.fstat(f.fileno())
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.path = path
+        self.view = memoryview(self._map)
+        self.size = st.st_size
+        self.identity = (st.st_ino, st.st_size, st.st_mtime_ns)
+        self.checked_at = time.monotonic()
+
+        # Same validators as starlette's FileResponse, so ETags agree on either path
+        etag = hashlib.md5(f"{st.st_mtime}-{st.st_size}".encode(), usedforsecurity=False).hexdigest()
+        self.etag = f'"{etag}"'
+        self.last_modified = formatdate(st.st_mtime, usegmt=True)
+        content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+        self.not_modified_headers = [(b"etag", self.etag.encode())]
+        self.headers = [
+            (b"content-type", content_type.encode()),
+            (b"content-length", str(self.size).encode()),
+            (b"last-modified", self.last_modified.encode()),
+            *self.not_modified_headers,
+        ]
+
+    def not_modified(self, request_headers) -> bool:
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            return self.etag in [tag.strip(" W/") for tag in if_none_match.split(",")]
+        since = parsedate(request_headers.get("if-modified-since") or "")
+        return since is not None and since >= parsedate(self.last_modified)
+
+
+class BlobCache:
+    def __init__(self, root=catalog.STATIC_DIR, max_bytes: int = MAX_BYTES,
+                 max_file_bytes: int = MAX_FILE_BYTES, admit_after: int = ADMIT_AFTER,
+                 revalidate_seconds: float = REVALIDATE_SECONDS):
+        self.root = os.path.realpath(root)
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.admit_after = admit_after
+        self.revalidate_seconds = revalidate_seconds
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # path -> Blob, least recently used first
+        self._seen = OrderedDict()     # path -> request count before admission
+        self.bytes = 0
+        self.counters = {
+            "hits": 0, "misses": 0, "not_modified": 0, "admitted": 0,
+            "evicted": 0, "stale": 0, "rejected_size": 0,
+        }
+
+    def _full_path(self, path: str) -> Optional[str]:
+        full_path = os.path.realpath(os.path.join(self.root, path))
+        if os.path.commonpath([full_path, self.root]) != self.root:
+            return None
+        return full_path
+
+    def get(self, path: str) -> Optional[Blob]:
+        """The cached blob for `path`, re-checking it against disk when due."""
+        with self._lock:
+            blob = self._entries.get(path)
+            if blob is None:
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(path)
+        now = time.monotonic()
+        if now - blob.checked_at >= self.revalidate_seconds:
+            try:
+                st = os.stat(self._full_path(path) or "")
+                current = (st.st_ino, st.st_size, st.st_mtime_ns)
+            except OSError:
+                current = None
+            if current != blob.identity:
+                with self._lock:
+                    self.counters["stale"] += 1
+                    self.counters["misses"] += 1
+                    if self._entries.get(path) is blob:
+                        self._drop(path)
+                return None
+            blob.checked_at = now
+        with self._lock:
+            self.counters["hits"] += 1
+        return blob
+
+    def wants(self, path: str) -> bool:
+        """Count a miss for `path`; True once it is requested often enough to map."""
+        with self._lock:
+            count = self._seen.pop(path, 0) + 1
+            self._seen[path] = count
+            if len(self._seen) > _SEEN_LIMIT:
+                self._seen.popitem(last=False)
+            return count >= self.admit_after
+
+    def load(self, path: str) -> Optional[Blob]:
+        """Map `path` into the cache (blocking; run off the event loop)."""
+        full_path = self._full_path(path)
+        if full_path is None:
+            return None
+        try:
+            size = os.stat(full_path).st_size
+            if not 0 < size <= min(self.max_file_bytes, self.max_bytes):
+                with self._lock:
+                    self.counters["rejected_size"] += 1
+                    self._seen.pop(path, None)
+                return None
+            blob = Blob(path, full_path)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self._seen.pop(path, None)
+            self._drop(path)
+            self._entries[path] = blob
+            self.bytes += blob.size
+            self.counters["admitted"] += 1
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.counters["evicted"] += 1
+        return blob
+
+    def _drop(self, path: str):
+        # Responses still sending from the mapping keep it alive; it is
+        # unmapped once the last view is released.
+        blob = self._entries.pop(path, None)
+        if blob is not None:
+            self.bytes -= blob.size
+
+    def count(self, counter: str):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def invalidate(self, prefix: str = ""):
+        with self._lock:
+            for path in [p for p in self._entries if p.startswith(prefix)]:
+                self._drop(path)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else None,
+                **self.counters,
+                "hottest": list(reversed(self._entries))[:10],
+            }
+
+
+cache = BlobCache()
+
+
+@cache_bus.subscribe(catalog.CHANNEL)
+def _invalidate_templates(_payload: str):
+    cache.invalidate(catalog.TEMPLATES_PREFIX)
+
+
+class BlobCacheMiddleware:
+    """Pure ASGI middleware; `allow(request)` must mirror the access checks
+    the regular stack applies to /static so a hit never bypasses them
+    (python -m backend.tools.blob_cache_auth_check verifies this)."""
+
+    def __init__(self, app, allow: Callable[[Request], bool], cache: BlobCache = cache):
+        self.app = app
+        self.allow = allow
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD") or not self.cache.max_bytes:
+            return await self.app(scope, receive, send)
+        path = scope["path"]
+        if not path.startswith(URL_PREFIX):
+            return await self.app(scope, receive, send)
+        path = path[len(URL_PREFIX):]
+        if not path.startswith(PREFIXES) or ".." in path.split("/"):
+            return await self.app(scope, receive, send)
+
+        request = Request(scope)
+        if not self.allow(request):
+            return await self.app(scope, receive, send)
+        blob = self.cache.get(path)
+        if blob is None and self.cache.wants(path):
+            blob = await run_in_threadpool(self.cache.load, path)
+        if blob is None:
+            return await self.app(scope, receive, send)
+
+        if blob.not_modified(request.headers):
+            self.cache.count("not_modified")
+            await send({"type": "http.response.start", "status": 304, "headers": blob.not_modified_headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        await send({"type": "http.response.start", "status": 200, "headers": blob.headers})
+        body = blob.view if scope["method"] == "GET" else b""
+        await send({"type": "http.response.body", "body": body})
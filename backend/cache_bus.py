@@ -0,0 +1,255 @@
+"""Cross-process invalidation bus for per-worker caches.
+
+Cache modules subscribe a handler to a channel; writers publish a short
+string payload (usually a key). Local handlers run immediately, and the
+message is fanned out to every other worker via Postgres LISTEN/NOTIFY or,
+when the database is not Postgres, via Unix datagram sockets in a shared
+directory on this host. Handlers run on the bus listener thread and must be
+thread-safe and cheap.
+"""
+import json
+import os
+import queue
+import select
+import socket
+import tempfile
+import threading
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+from backend.logs import get_logger
+
+logger = get_logger("cache_bus")
+
+PG_CHANNEL = "archisketch_cache"
+
+_handlers = defaultdict(list)
+_transport = None
+_origin = None
+
+
+def subscribe(channel: str):
+    """Decorator registering `handler(payload: str)` for a channel."""
+    def decorator(handler):
+        _handlers[channel].append(handler)
+        return handler
+    return decorator
+
+
+def _dispatch(channel: str, payload: str):
+    for handler in _handlers.get(channel, ()):
+        try:
+            handler(payload)
+        except Exception:
+            logger.exception("Cache bus handler failed", extra={"channel": channel})
+
+
+def _origin_id() -> str:
+    global _origin
+    if _origin is None or not _origin.startswith(f"{os.getpid()}:"):
+        _origin = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    return _origin
+
+
+def publish(channel: str, payload: str = ""):
+    """Run local handlers now and notify every other worker."""
+    _dispatch(channel, payload)
+    if _transport is None:
+        return
+    message = json.dumps({"c": channel, "p": payload, "o": _origin_id()})
+    try:
+        _transport.send(message)
+    except Exception as e:
+        logger.warning("Cache bus publish failed", extra={"channel": channel, "error": str(e)})
+
+
+def _receive(message: str):
+    try:
+        data = json.loads(message)
+    except ValueError:
+        return
+    if data.get("o") == _origin_id():
+        return
+    _dispatch(data.get("c"), data.get("p", ""))
+
+
+class PostgresTransport:
+    """NOTIFY to publish; a dedicated LISTEN connection per worker to receive.
+
+    send() only queues the message: publishes come from request handlers on
+    the event loop, so a sender thread does the database round trip,
+    batching whatever has queued up into one transaction.
+    """
+
+    _STOP = object()
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._stop = threading.Event()
+        self._outbox = queue.SimpleQueue()
+        self._thread = None
+        self._sender = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._listen, name="cache-bus", daemon=True)
+        self._thread.start()
+        self._sender = threading.Thread(target=self._send_loop, name="cache-bus-send", daemon=True)
+        self._sender.start()
+
+    def send(self, message: str):
+        self._outbox.put(message)
+
+    def _send_loop(self):
+        from sqlalchemy import text
+
+        notify = text("SELECT pg_notify(:channel, m) FROM unnest(CAST(:messages AS text[])) AS m")
+        while True:
+            batch = [self._outbox.get()]
+            while True:
+                try:
+                    batch.append(self._outbox.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = self._STOP in batch
+            messages = [m for m in batch if m is not self._STOP]
+            if messages:
+                try:
+                    with self.engine.begin() as conn:
+                        conn.execute(notify, {"channel": PG_CHANNEL, "messages": messages})
+                except Exception as e:
+                    logger.warning("Cache bus publish failed", extra={"messages": len(messages), "error": str(e)})
+            if stopping:
+                return
+
+    def _listen(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            conn = None
+            try:
+                proxied = self.engine.raw_connection()
+                proxied.detach()  # long-lived LISTEN socket stays out of the pool
+                conn = proxied.dbapi_connection
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {PG_CHANNEL}")
+                backoff = 1.0
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 5.0)[0]:
+                        conn.poll()
+                        while conn.notifies:
+                            _receive(conn.notifies.pop(0).payload)
+            except Exception as e:
+                logger.warning("Cache bus listener reconnecting", extra={"error": str(e)})
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+    def stop(self):
+        self._stop.set()
+        self._outbox.put(self._STOP)
+        if self._sender is not None:
+            self._sender.join(5.0)  # flush what is already queued
+
+
+class UnixSocketTransport:
+    """One datagram socket per worker in a shared directory on this host."""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        self.path = self.directory / f"{os.getpid()}.sock"
+        self._stop = threading.Event()
+        self._sock = None
+        self._thread = None
+
+    def start(self):
+        if self.path.exists():
+            self.path.unlink()
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(str(self.path))
+        self._sock.settimeout(1.0)
+        self._thread = threading.Thread(target=self._listen, name="cache-bus", daemon=True)
+        self._thread.start()
+
+    def send(self, message: str):
+        data = message.encode("utf-8")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as out:
+            for peer in self.directory.glob("*.sock"):
+                if peer == self.path:
+                    continue
+                try:
+                    out.sendto(data, str(peer))
+                except (ConnectionRefusedError, FileNotFoundError):
+                    peer.unlink(missing_ok=True)  # worker is gone
+                except OSError as e:
+                    logger.warning("Cache bus peer unreachable", extra={"peer": peer.name, "error": str(e)})
+
+    def _listen(self):
+        while not self._stop.is_set():
+            try:
+                data = self._sock.recv(65536)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            _receive(data.decode("utf-8", "replace"))
+
+    def stop(self):
+        self._stop.set()
+        if self._sock is not None:
+            self._sock.close()
+        self.path.unlink(missing_ok=True)
+
+
+def _default_socket_dir() -> str:
+    return os.getenv("CACHE_BUS_DIR") or os.path.join(tempfile.gettempdir(), f"archisketch-bus-{os.getuid()}")
+
+
+def start():
+    """Start this worker's transport. CACHE_BUS=postgres|unix|local|auto (default)."""
+    global _transport
+    if _transport is not None:
+        return
+    kind = os.getenv("CACHE_BUS", "auto").lower()
+    if kind == "local":
+        return
+
+    transport = None
+    if kind in ("auto", "postgres"):
+        try:
+            from backend.db import get_engine
+
+            engine = get_engine()
+            if engine.dialect.name == "postgresql":
+                transport = PostgresTransport(engine)
+        except Exception as e:
+            logger.warning("Postgres cache bus unavailable", extra={"error": str(e)})
+    if transport is None and kind != "postgres":
+        transport = UnixSocketTransport(_default_socket_dir())
+    if transport is None:
+        return
+
+    transport.start()
+    _transport = transport
+    logger.info("Cache bus started", extra={"transport": type(transport).__name__})
+
+
+def stop():
+    global _transport
+    if _transport is not None:
+        _transport.stop()
+        _transport = None
+
+
+def _reset_after_fork():
+    # Listener threads and sockets belong to the parent.
+    global _transport
+    _transport = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
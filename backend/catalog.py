@@ -0,0 +1,197 @@
+"""Versioned catalog of the files the offline PWA keeps (templates, tutorials).
+
+scan() compares static/templates and static/tutorials with catalog_items and
+gives every changed, added or removed file the next catalog version. Clients
+keep the highest version they have seen as a cursor and ask only for rows
+newer than it, so a sync downloads just the deltas.
+
+Files are only re-hashed when their size or mtime changes. Templates also
+get perceptual hashes, which back duplicate detection (backend/template_index.py).
+
+Scans run from run_forever(), one background task per web worker (the files
+live on the web host), and after template uploads; /api/catalog only reads.
+The periodic pass compares sizes and mtimes read-only and takes the write
+lock only when something actually changed.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from backend import cache_bus, phash
+from backend.db import SessionLocal, take_write_lock
+from backend.logs import get_logger
+from backend.models import CatalogItem
+
+logger = get_logger("catalog")
+
+STATIC_DIR = Path(__file__).parent.parent / "static"
+ROOTS = ("templates", "tutorials")
+URL_PREFIX = "/static"
+SCAN_INTERVAL_SECONDS = float(os.getenv("CATALOG_SCAN_SECONDS", "60"))  # 0 disables the periodic scan
+TEMPLATES_PREFIX = "templates/"
+CHANNEL = "catalog.changed"  # published after a scan that changed anything
+_ADVISORY_LOCK_ID = 0x41524354  # "ARCT": one scanner at a time across workers
+
+_scan_lock = threading.Lock()
+
+
+def _files():
+    """{relative path: os.stat_result} for every catalogued file."""
+    found = {}
+    for root in ROOTS:
+        base = STATIC_DIR / root
+        if base.is_file():
+            found[root] = base.stat()
+            continue
+        for dirpath, _, filenames in os.walk(base):
+            for name in filenames:
+                if name.startswith("."):
+                    continue
+                path = Path(dirpath) / name
+                found[path.relative_to(STATIC_DIR).as_posix()] = path.stat()
+    return found
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _perceptual(row: CatalogItem):
+    found = phash.hashes((STATIC_DIR / row.path).read_bytes())
+    row.dhash, row.phash = (phash.to_hex(found[0]), phash.to_hex(found[1])) if found else ("", "")
+
+
+def current_version(db: Session) -> int:
+    return db.query(func.max(CatalogItem.version)).scalar() or 0
+
+
+def scan(db: Session) -> int:
+    """Record filesystem changes under the next version; returns the current version."""
+    with _scan_lock:
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": _ADVISORY_LOCK_ID})
+        else:
+            take_write_lock(db.connection())
+
+        rows = {row.path: row for row in db.query(CatalogItem).all()}
+        version = max((row.version for row in rows.values()), default=0)
+        next_version = version + 1
+        changed = 0
+
+        files = _files()
+        for path, st in files.items():
+            row = rows.get(path)
+            template = path.startswith(TEMPLATES_PREFIX)
+            if row is not None and not row.deleted and row.size == st.st_size and row.mtime == st.st_mtime:
+                if template and row.phash is None:
+                    _perceptual(row)  # rows from before perceptual hashing
+                continue
+            sha = _sha256(STATIC_DIR / path)
+            if row is None:
+                row = CatalogItem(path=path, sha256=sha, size=st.st_size,
+                                  mtime=st.st_mtime, version=next_version)
+                db.add(row)
+                changed += 1
+            elif row.deleted or row.sha256 != sha:
+                row.version = next_version
+                row.deleted = False
+                row.phash = None
+                changed += 1
+            row.sha256, row.size, row.mtime = sha, st.st_size, st.st_mtime  # touch-only: no new version
+            if template and row.phash is None:
+                _perceptual(row)
+
+        for path, row in rows.items():
+            if path not in files and not row.deleted:
+                row.deleted = True
+                row.version = next_version
+                changed += 1
+
+        db.commit()
+
+    if changed:
+        logger.info("Catalog updated", extra={"version": next_version, "changed": changed})
+        cache_bus.publish(CHANNEL, str(next_version))
+        return next_version
+    return version
+
+
+def has_changes(db: Session) -> bool:
+    """True if the files on disk differ from catalog_items (read-only)."""
+    rows = {
+        row.path: row for row in db.query(
+            CatalogItem.path, CatalogItem.size, CatalogItem.mtime, CatalogItem.deleted, CatalogItem.phash
+        )
+    }
+    files = _files()
+    for path, st in files.items():
+        row = rows.get(path)
+        if row is None or row.deleted or row.size != st.st_size or row.mtime != st.st_mtime:
+            return True
+        if path.startswith(TEMPLATES_PREFIX) and row.phash is None:
+            return True
+    return any(path not in files and not row.deleted for path, row in rows.items())
+
+
+def scan_if_changed() -> int:
+    """scan() on a session of its own, only when has_changes(); returns the current version."""
+    db = SessionLocal()
+    try:
+        if has_changes(db):
+            return scan(db)
+        return current_version(db)
+    finally:
+        db.close()
+
+
+async def run_forever():
+    """Background loop started from the app lifespan."""
+    while True:
+        try:
+            await run_in_threadpool(scan_if_changed)
+            delay = SCAN_INTERVAL_SECONDS
+        except Exception:
+            logger.exception("Catalog scan failed")
+            delay = min(SCAN_INTERVAL_SECONDS, 5.0)  # e.g. tables not created yet
+        await asyncio.sleep(delay)
+
+
+def _item(row: CatalogItem) -> dict:
+    return {
+        "path": row.path,
+        "url": f"{URL_PREFIX}/{row.path}",
+        "sha256": None if row.deleted else row.sha256,
+        "size": 0 if row.deleted else row.size,
+        "version": row.version,
+        "deleted": row.deleted,
+    }
+
+
+def changes(db: Session, since: int = 0) -> dict:
+    """Everything that changed after version `since`.
+
+    A cursor ahead of the server (e.g. the catalog was rebuilt) gets a full
+    listing with reset=True, telling the client to drop what it has.
+    """
+    version = current_version(db)
+    reset = since > version
+    query = db.query(CatalogItem)
+    if reset or since <= 0:
+        query = query.filter(CatalogItem.deleted.is_(False))
+    else:
+        query = query.filter(CatalogItem.version > since)
+    return {
+        "cursor": version,
+        "reset": reset,
+        "items": [_item(row) for row in query.order_by(CatalogItem.version, CatalogItem.path)],
+    }
@@ -1,28 +1,353 @@
+"""Engines and sessions.
+
+Writes go to DATABASE_URL. Read-only dependencies use DATABASE_REPLICA_URL
+when it is set (for a local check, point the two variables at two SQLite
+files or two Postgres databases). After a user writes, their reads stay on
+the primary for READ_YOUR_WRITES_SECONDS so they never see replica lag on
+their own data.
+
+Without DATABASE_URL the app runs on an embedded SQLite file (SQLITE_PATH).
+SQLite connections use WAL with tuned pragmas. Primary sessions begin
+DEFERRED, so plain reads never take the database-wide write lock; the
+first write in a transaction ends its read snapshot and starts over with
+BEGIN IMMEDIATE (the same per-statement visibility as Postgres' READ
+COMMITTED). Read-only sessions use a separate pool of query_only
+connections that WAL lets run alongside writers.
+"""
 import os
-from sqlalchemy import create_engine
+import re
+import threading
+import time
+from pathlib import Path
+from fastapi import Request
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
+from . import cache_bus
+from .logs import get_logger
 from .models import Base
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+logger = get_logger("db")
+
+STICKY_CHANNEL = "db.sticky"
+STICKY_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "10"))
+
+SQLITE_PATH = os.getenv("SQLITE_PATH", str(Path(__file__).parent.parent / "archisketch.db"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_BYTES = int(os.getenv("SQLITE_MMAP_BYTES", str(256 * 1024 * 1024)))
+SQLITE_CACHE_KIB = int(os.getenv("SQLITE_CACHE_KIB", "65536"))
+SQLITE_READERS = int(os.getenv("SQLITE_READERS", "8"))
+SQLITE_WRITERS = int(os.getenv("SQLITE_WRITERS", "4"))
+_WRITE_STATEMENT = re.compile(r"\s*(INSERT|UPDATE|DELETE|REPLACE|CREATE|ALTER|DROP)\b", re.IGNORECASE)
+
+_engine = None
+_read_engine = None
+_engine_lock = threading.Lock()
+_sticky = {}  # user key -> wall-clock time until which reads use the primary
+
+# Unbound factory; SessionLocal() binds it to the lazily created engine.
+_session_factory = sessionmaker(autocommit=False, autoflush=False)
+
+
+def _normalize_url(url: str) -> str:
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    return url
+
+
+def database_url() -> str:
+    """DATABASE_URL, or the embedded SQLite file when it is unset."""
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        return f"sqlite:///{SQLITE_PATH}"
+    return _normalize_url(url)
+
+
+def replica_url():
+    url = os.getenv("DATABASE_REPLICA_URL")
+    return _normalize_url(url) if url else None
+
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def _sqlite_engine(url: str, writer: bool):
+    """SQLite engine: tuned WAL pragmas; a small writer pool, or a pool of readers.
+
+    pysqlite's own transaction handling is turned off so that we issue BEGIN
+    ourselves. Transactions start DEFERRED; on the writer, the first write
+    statement commits whatever was only read so far and re-begins with BEGIN
+    IMMEDIATE. A second writer then waits on busy_timeout up front instead of
+    failing to upgrade a stale read snapshot halfway (SQLITE_BUSY_SNAPSHOT),
+    and sessions that only read never hold the write lock.
+    """
+    if make_url(url).database in (None, "", ":memory:"):
+        return create_engine(url, connect_args={"check_same_thread": False})
+
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+        pool_size=SQLITE_WRITERS if writer else SQLITE_READERS,
+        max_overflow=0,
+        pool_timeout=30,
+        pool_pre_ping=False,
+    )
+
+    @event.listens_for(engine, "connect")
+    def _configure(dbapi_conn, _record):
+        dbapi_conn.isolation_level = None  # we issue BEGIN ourselves
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")  # durable at checkpoints; safe with WAL
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_BYTES}")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_KIB}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        if not writer:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _begin(conn):
+        conn.info.pop("sqlite_writing", None)
+        if conn.get_execution_options().get("isolation_level") == "AUTOCOMMIT":
+            return
+        conn.exec_driver_sql("BEGIN")
+
+    if writer:
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before_write(conn, _cursor, statement, _params, _context, _executemany):
+            if _WRITE_STATEMENT.match(statement):
+                take_write_lock(conn)
+
+    return engine
+
+
+def take_write_lock(conn):
+    """Hold SQLite's write lock for the rest of conn's transaction.
+
+    Writes call this implicitly; call it first for read-then-write logic
+    that must not interleave with other writers (e.g. claiming jobs).
+    A no-op outside SQLite.
+    """
+    if conn.dialect.name != "sqlite" or conn.info.get("sqlite_writing"):
+        return
+    dbapi_conn = conn.connection.dbapi_connection
+    if not dbapi_conn.in_transaction:
+        return  # autocommit: each statement locks for itself
+    dbapi_conn.execute("COMMIT")  # nothing written yet; just drops the read snapshot
+    dbapi_conn.execute("BEGIN IMMEDIATE")
+    conn.info["sqlite_writing"] = True
+
+
+def _create_engine(url: str, writer: bool = True):
+    if is_sqlite(url):
+        return _sqlite_engine(url, writer)
+    return create_engine(url)
+
+
+def get_engine():
+    """Create the engine on first use instead of at import time."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                url = database_url()
+                if not os.getenv("DATABASE_URL"):
+                    logger.warning("DATABASE_URL not set; using embedded SQLite", extra={"path": SQLITE_PATH})
+                _engine = _create_engine(url)
+                logger.info("Database engine created",
+                            extra={"url": make_url(url).render_as_string(hide_password=True)})
+    return _engine
+
+
+def get_read_engine():
+    """Replica engine; the SQLite reader pool; otherwise the primary."""
+    global _read_engine
+    url = replica_url()
+    if url is None:
+        url = database_url()
+        if not is_sqlite(url) or make_url(url).database in (None, "", ":memory:"):
+            return get_engine()
+    if _read_engine is None:
+        with _engine_lock:
+            if _read_engine is None:
+                _read_engine = _create_engine(url, writer=False)
+                logger.info("Read engine created",
+                            extra={"url": make_url(url).render_as_string(hide_password=True)})
+    return _read_engine
+
+
+def SessionLocal():
+    return _session_factory(bind=get_engine())
+
+
+def ReadSessionLocal():
+    return _session_factory(bind=get_read_engine())
+
+
+def mark_write(key: str):
+    """Pin `key`'s reads to the primary for STICKY_SECONDS, in every worker."""
+    if key:
+        cache_bus.publish(STICKY_CHANNEL, key)
 
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL environment variable not set")
 
-print(f"Database URL: {DATABASE_URL}")  # Add this line
+@cache_bus.subscribe(STICKY_CHANNEL)
+def _pin(key: str):
+    now = time.time()
+    if len(_sticky) > 10000:
+        for stale in [k for k, until in list(_sticky.items()) if until <= now]:
+            _sticky.pop(stale, None)
+    _sticky[key] = now + STICKY_SECONDS
 
-if DATABASE_URL.startswith("postgres://"):
-    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-try:
-    engine = create_engine(DATABASE_URL)
-    # Test the connection immediately
-    with engine.connect() as conn:
-        print("Database connection successful!")
-except Exception as e:
-    print(f"Database connection failed: {str(e)}")
-    raise
+def is_sticky(key: str) -> bool:
+    return bool(key) and _sticky.get(key, 0) > time.time()
+
+
+def read_session_for(key: str = None):
+    """Session for a read-only path on behalf of `key` (usually an email).
+
+    SQLite readers share the primary's file and see every commit at once,
+    so only a real replica needs the read-your-writes pin.
+    """
+    if is_sticky(key) and replica_url() is not None:
+        return SessionLocal()
+    return ReadSessionLocal()
+
+
+class LazySession:
+    """Stands in for a Session and creates it on first use.
+
+    A request that returns early or fails validation never builds a session
+    or checks out a connection, and close() on an unused proxy is free.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._session = None
+
+    @property
+    def started(self) -> bool:
+        return self._session is not None
+
+    def __getattr__(self, name):
+        if self._session is None:
+            self._session = self._factory()
+        return getattr(self._session, name)
+
+    def rollback(self):
+        if self._session is not None:
+            self._session.rollback()
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+
+def request_db(request: Request) -> LazySession:
+    """Primary session shared by middleware and handlers for one request."""
+    db = getattr(request.state, "db", None)
+    if db is None:
+        db = request.state.db = LazySession(SessionLocal)
+    return db
+
+
+def request_read_db(request: Request) -> LazySession:
+    """Read session for one request; the user is taken from ?email= or the user_email cookie."""
+    db = getattr(request.state, "read_db", None)
+    if db is None:
+        key = request.query_params.get("email") or request.cookies.get("user_email")
+        db = request.state.read_db = LazySession(lambda: read_session_for(key))
+    return db
+
+
+def close_request_sessions(request: Request):
+    for name in ("db", "read_db"):
+        db = getattr(request.state, name, None)
+        if db is not None:
+            db.close()
+            setattr(request.state, name, None)
+
+
+async def db_session_middleware(request: Request, call_next):
+    """Owns the request's sessions; register it outermost so every layer shares them."""
+    request.state.sessions_managed = True
+    try:
+        return await call_next(request)
+    finally:
+        close_request_sessions(request)
+
+
+def _scoped(request: Request, db: LazySession):
+    try:
+        yield db
+    finally:
+        # Without the middleware the dependency owns the session.
+        if not getattr(request.state, "sessions_managed", False):
+            db.close()
+
+
+def get_db(request: Request):
+    """Dependency for the request's primary session."""
+    yield from _scoped(request, request_db(request))
+
+
+def get_read_db(request: Request):
+    """Dependency for the request's read-only session."""
+    yield from _scoped(request, request_read_db(request))
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def init_db():
+    """Create missing tables; bring the schema up to date.
+
+    A brand-new database gets the current schema from the models and is
+    stamped as fully migrated. An existing one is only migrated here when
+    AUTO_MIGRATE=1; otherwise run `python -m backend.tools.migrate upgrade`.
+    """
+    from . import migrations
+
+    engine = get_engine()
+    fresh = not inspect(engine).has_table("users")
     Base.metadata.create_all(bind=engine)
+    if fresh:
+        migrations.stamp(engine)
+    elif os.getenv("AUTO_MIGRATE") == "1":
+        migrations.upgrade(engine)
+
+
+def check_db():
+    """Raise if the database cannot answer a trivial query."""
+    for engine in {get_engine(), get_read_engine()}:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+
+def dispose_engine():
+    global _engine, _read_engine
+    with _engine_lock:
+        for engine in (_engine, _read_engine):
+            if engine is not None:
+                engine.dispose()
+        _engine = _read_engine = None
+
+
+def _reset_pool_after_fork():
+    # Pooled connections opened before a pre-fork (e.g. by the preloading
+    # master) must not be shared with the children.
+    for engine in (_engine, _read_engine):
+        if engine is not None:
+            engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_reset_pool_after_fork)
+
+
+def __getattr__(name):
+    # Keeps `from backend.db import engine` working without connecting at import.
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
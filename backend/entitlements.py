@@ -0,0 +1,61 @@
+"""Per-worker cache of each user's current subscription expiry.
+
+Entries live for at most ENTITLEMENT_CACHE_TTL seconds (and never past the
+subscription's own expiry). Anything that writes a subscription calls
+invalidate(email), which drops the entry in every worker via the cache bus.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from backend import cache_bus
+from backend.models import Subscription
+
+CHANNEL = "entitlements"
+TTL_SECONDS = float(os.getenv("ENTITLEMENT_CACHE_TTL", "30"))
+MAX_ENTRIES = int(os.getenv("ENTITLEMENT_CACHE_SIZE", "50000"))
+
+_cache = OrderedDict()  # email -> (cached_until_monotonic, expiry_date or None)
+_lock = threading.Lock()
+
+
+def active_expiry(db: Session, email: str) -> Optional[datetime]:
+    """Expiry (UTC) of the user's latest active subscription, or None."""
+    now = datetime.utcnow()
+    with _lock:
+        hit = _cache.get(email)
+    if hit is not None and hit[0] > time.monotonic() and (hit[1] is None or hit[1] > now):
+        return hit[1]
+
+    sub = db.query(Subscription).filter(
+        Subscription.user_email == email,
+        Subscription.expiry_date > now
+    ).order_by(Subscription.expiry_date.desc()).first()
+    expiry = sub.expiry_date if sub else None
+
+    ttl = TTL_SECONDS
+    if expiry is not None:
+        ttl = min(ttl, (expiry - now).total_seconds())
+    with _lock:
+        _cache[email] = (time.monotonic() + ttl, expiry)
+        _cache.move_to_end(email)
+        while len(_cache) > MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return expiry
+
+
+def invalidate(email: str):
+    """Call after committing any subscription change for `email`."""
+    if email:
+        cache_bus.publish(CHANNEL, email)
+
+
+@cache_bus.subscribe(CHANNEL)
+def _drop(email: str):
+    with _lock:
+        _cache.pop(email, None)
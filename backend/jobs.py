@@ -0,0 +1,230 @@
+"""Durable background jobs stored in the application database.
+
+Request handlers enqueue work with enqueue(db, kind, payload) in the same
+transaction as whatever they are writing; a separate worker process
+(`python -m backend.worker`) claims due jobs and runs them on a thread pool.
+
+Claiming uses SELECT ... FOR UPDATE SKIP LOCKED on Postgres, so any number
+of workers can poll the same table without blocking one another. On SQLite
+the claim takes the write lock before selecting, which serializes it.
+
+A job that raises is retried with exponential backoff until max_attempts,
+then left in the `dead` state with its last error. PermanentJobError skips
+the retries. A job whose worker died is picked up again once its lease
+(JOB_LEASE_SECONDS) runs out, so handlers must be safe to run twice.
+
+Payload keys a handler declares secret (one-time codes) are blanked as
+soon as its job is done or dead, and dead jobs of such kinds are deleted
+once their deadline has passed rather than kept for inspection.
+"""
+import json
+import os
+import random
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from backend.db import SessionLocal, get_engine, take_write_lock
+from backend.logs import get_logger
+from backend.models import Job
+
+logger = get_logger("jobs")
+
+CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "4"))
+POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "10"))
+RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "3600"))
+RETENTION_HOURS = int(os.getenv("JOB_RETENTION_HOURS", "72"))  # finished jobs kept this long
+DEFAULT_MAX_ATTEMPTS = 5
+
+# Modules whose @handler functions the worker must import
+HANDLER_MODULES = ("backend.mailer",)
+
+_handlers = {}
+_secrets = {}  # kind -> payload keys blanked once the job is finished
+
+
+class PermanentJobError(Exception):
+    """Raise from a handler when retrying cannot help."""
+
+
+def handler(kind: str, secret: tuple = ()):
+    """Register the decorated function to run jobs of `kind` with **payload.
+
+    `secret` names payload keys that must not outlive the job.
+    """
+    def register(fn):
+        _handlers[kind] = fn
+        if secret:
+            _secrets[kind] = tuple(secret)
+        return fn
+    return register
+
+
+def enqueue(db: Session, kind: str, payload: dict = None, delay_seconds: float = 0,
+            max_attempts: int = DEFAULT_MAX_ATTEMPTS, deadline: datetime = None) -> Job:
+    """Add a job to `db`; it is queued when the caller commits."""
+    now = datetime.utcnow()
+    job = Job(
+        kind=kind,
+        payload=json.dumps(payload or {}),
+        status="queued",
+        attempts=0,
+        max_attempts=max_attempts,
+        run_at=now + timedelta(seconds=delay_seconds),
+        deadline=deadline,
+        created_at=now,
+    )
+    db.add(job)
+    return job
+
+
+def retry_delay(attempts: int) -> float:
+    delay = min(RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def claim(worker_id: str, limit: int, now: datetime = None) -> list:
+    """Lock up to `limit` due jobs for `worker_id`; returns their rows."""
+    now = now or datetime.utcnow()
+    expired_lease = now - timedelta(seconds=LEASE_SECONDS)
+    due = select(Job.__table__).where(or_(
+        and_(Job.status == "queued", Job.run_at <= now),
+        and_(Job.status == "running", Job.locked_at < expired_lease),
+    )).order_by(Job.run_at).limit(limit).with_for_update(skip_locked=True)
+
+    with get_engine().begin() as conn:
+        take_write_lock(conn)
+        rows = conn.execute(due).mappings().all()
+        if rows:
+            conn.execute(
+                update(Job).where(Job.id.in_([row["id"] for row in rows])).values(
+                    status="running", locked_by=worker_id, locked_at=now, attempts=Job.attempts + 1
+                )
+            )
+    return [{**row, "attempts": row["attempts"] + 1} for row in rows]
+
+
+def _finish(job: dict, worker_id: str, **values):
+    # Guarded by locked_by: if our lease ran out and another worker took the
+    # job, its outcome wins.
+    with get_engine().begin() as conn:
+        conn.execute(
+            update(Job).where(Job.id == job["id"], Job.locked_by == worker_id).values(**values)
+        )
+
+
+def _redacted(job: dict) -> dict:
+    """`payload` update blanking the job's secret keys; empty if it has none."""
+    keys = _secrets.get(job["kind"])
+    if not keys:
+        return {}
+    payload = json.loads(job["payload"] or "{}")
+    return {"payload": json.dumps({k: None if k in keys else v for k, v in payload.items()})}
+
+
+def execute(job: dict, worker_id: str):
+    """Run one claimed job and record the outcome."""
+    now = datetime.utcnow()
+    fn = _handlers.get(job["kind"])
+    extra = {"job_id": job["id"], "kind": job["kind"], "attempt": job["attempts"]}
+    try:
+        if fn is None:
+            raise PermanentJobError(f"no handler for job kind {job['kind']!r}")
+        if job["deadline"] is not None and now > job["deadline"]:
+            raise PermanentJobError("deadline passed before the job could run")
+        fn(**json.loads(job["payload"] or "{}"))
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        permanent = isinstance(e, PermanentJobError) or job["attempts"] >= job["max_attempts"]
+        if permanent:
+            logger.error("Job dead", extra={**extra, "error": error})
+            _finish(job, worker_id, status="dead", last_error=error, finished_at=datetime.utcnow(), locked_by=None,
+                    **_redacted(job))
+        else:
+            delay = retry_delay(job["attempts"])
+            logger.warning("Job failed; will retry", extra={**extra, "error": error, "retry_in": round(delay, 1)})
+            _finish(job, worker_id, status="queued", last_error=error, locked_by=None,
+                    run_at=datetime.utcnow() + timedelta(seconds=delay))
+        return
+    _finish(job, worker_id, status="done", finished_at=datetime.utcnow(), locked_by=None, **_redacted(job))
+    logger.info("Job done", extra={**extra, "ms": round((datetime.utcnow() - now).total_seconds() * 1000, 1)})
+
+
+def prune(now: datetime = None) -> int:
+    """Delete finished jobs older than RETENTION_HOURS.
+
+    Dead jobs are kept, except those carrying secrets, which go once their
+    deadline (for an OTP, its expiry) has passed.
+    """
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(hours=RETENTION_HOURS)
+    expired_secrets = and_(
+        Job.status == "dead", Job.kind.in_(list(_secrets)), Job.deadline.is_not(None), Job.deadline < now
+    )
+    with get_engine().begin() as conn:
+        return conn.execute(delete(Job).where(or_(
+            and_(Job.status == "done", Job.finished_at < cutoff), expired_secrets
+        ))).rowcount
+
+
+def counts() -> dict:
+    """{status: number of jobs}"""
+    db = SessionLocal()
+    try:
+        return dict(db.query(Job.status, func.count(Job.id)).group_by(Job.status).all())
+    finally:
+        db.close()
+
+
+class Worker:
+    """Polls for due jobs and runs up to `concurrency` of them at once."""
+
+    def __init__(self, concurrency: int = CONCURRENCY, poll_seconds: float = POLL_SECONDS):
+        self.concurrency = max(1, concurrency)
+        self.poll_seconds = poll_seconds
+        self.id = f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+        self._stopping = threading.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    def run(self):
+        logger.info("Job worker started", extra={"worker": self.id, "concurrency": self.concurrency})
+        inflight = set()
+        next_prune = 0.0
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="job") as pool:
+            while not self._stopping.is_set():
+                free = self.concurrency - len(inflight)
+                claimed = []
+                if free > 0:
+                    try:
+                        claimed = claim(self.id, free)
+                    except Exception:
+                        logger.exception("Claiming jobs failed")
+                for job in claimed:
+                    inflight.add(pool.submit(execute, job, self.id))
+
+                if time.monotonic() >= next_prune:
+                    next_prune = time.monotonic() + 600
+                    try:
+                        prune()
+                    except Exception:
+                        logger.exception("Pruning finished jobs failed")
+
+                if claimed and len(claimed) == free:
+                    # Saturated: wait for a slot rather than re-polling.
+                    _, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                elif inflight:
+                    _, inflight = wait(inflight, timeout=0 if claimed else self.poll_seconds,
+                                       return_when=FIRST_COMPLETED)
+                elif not claimed:
+                    self._stopping.wait(self.poll_seconds)
+            wait(inflight)
+        logger.info("Job worker stopped", extra={"worker": self.id})
@@ -0,0 +1,222 @@
+"""Turn a phone photo of a paper plan into a light, transparent line-art PNG.
+
+Pipeline (all array work is vectorized NumPy):
+  1. decode, apply EXIF orientation, grayscale, cap the long side
+  2. optional perspective correction from four corners
+  3. adaptive threshold against the local mean (integral image), plus an
+     optional Sobel edge pass, then drop isolated specks
+  4. encode as a 1-bit palette PNG whose background index is transparent
+
+Results are cached on disk by a hash of the source bytes and parameters.
+The cache is bounded: after each new entry the least recently used files
+(by access time, bumped on every hit) are removed until the directory is
+under LINEART_CACHE_MAX_BYTES.
+"""
+import hashlib
+import io
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageOps
+
+MAX_SIDE = int(os.getenv("LINEART_MAX_SIDE", "2048"))
+CACHE_DIR = Path(os.getenv(
+    "LINEART_CACHE_DIR",
+    Path(__file__).parent.parent / "static" / "derived" / "lineart"
+))
+CACHE_URL_PREFIX = "/static/derived/lineart"
+CACHE_MAX_BYTES = int(os.getenv("LINEART_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+def cache_key(data: bytes, params: dict) -> str:
+    digest = hashlib.sha256(data)
+    digest.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+def load_grayscale(data: bytes, max_side: int = MAX_SIDE) -> np.ndarray:
+    img = Image.open(io.BytesIO(data))
+    img.draft("L", (max_side, max_side))  # JPEG: decode at reduced scale when possible
+    img = ImageOps.exif_transpose(img).convert("L")
+    img.thumbnail((max_side, max_side), Image.LANCZOS)
+    return np.asarray(img, dtype=np.float32)
+
+
+def _homography(src, dst) -> np.ndarray:
+    """3x3 matrix mapping each dst point onto its src point."""
+    rows, rhs = [], []
+    for (x, y), (u, v) in zip(dst, src):
+        rows.append([x, y, 1, 0, 0, 0, -u * x, -u * y])
+        rows.append([0, 0, 0, x, y, 1, -v * x, -v * y])
+        rhs.extend([u, v])
+    h = np.linalg.solve(np.array(rows, dtype=np.float64), np.array(rhs, dtype=np.float64))
+    return np.append(h, 1.0).reshape(3, 3)
+
+
+def is_convex_quad(corners, min_turn: float = 1e-4) -> bool:
+    """True if the four corners, in order, make a convex quadrilateral.
+
+    Duplicate or collinear corners (and self-intersecting orders) give a
+    singular or folded homography, so warp_perspective refuses them.
+    """
+    pts = np.asarray(corners, dtype=np.float64)
+    edges = np.roll(pts, -1, axis=0) - pts
+    following = np.roll(edges, -1, axis=0)
+    turns = edges[:, 0] * following[:, 1] - edges[:, 1] * following[:, 0]
+    return bool(np.all(turns > min_turn) or np.all(turns < -min_turn))
+
+
+def warp_perspective(gray: np.ndarray, corners) -> np.ndarray:
+    """Rectify the quadrilateral `corners` (TL, TR, BR, BL as 0..1 fractions).
+
+    Uses inverse mapping with bilinear sampling; the output keeps the
+    longer of each pair of opposite edges.
+    """
+    if not is_convex_quad(corners):
+        raise ValueError("corners do not form a convex quadrilateral")
+    h, w = gray.shape
+    pts = np.array(corners, dtype=np.float64) * [w - 1, h - 1]
+    tl, tr, br, bl = pts
+    out_w = int(round(max(np.linalg.norm(tr - tl), np.linalg.norm(br - bl))))
+    out_h = int(round(max(np.linalg.norm(bl - tl), np.linalg.norm(br - tr))))
+    out_w, out_h = max(out_w, 2), max(out_h, 2)
+
+    dst = np.array([[0, 0], [out_w - 1, 0], [out_w - 1, out_h - 1], [0, out_h - 1]], dtype=np.float64)
+    H = _homography(pts, dst)
+
+    ys, xs = np.mgrid[0:out_h, 0:out_w]
+    coords = np.stack([xs.ravel(), ys.ravel(), np.ones(xs.size)])
+    sx, sy, sw = H @ coords
+    sx = np.clip(sx / sw, 0, w - 1.001)
+    sy = np.clip(sy / sw, 0, h - 1.001)
+
+    x0, y0 = sx.astype(np.intp), sy.astype(np.intp)
+    fx, fy = (sx - x0).astype(np.float32), (sy - y0).astype(np.float32)
+    top = gray[y0, x0] * (1 - fx) + gray[y0, x0 + 1] * fx
+    bottom = gray[y0 + 1, x0] * (1 - fx) + gray[y0 + 1, x0 + 1] * fx
+    return (top * (1 - fy) + bottom * fy).reshape(out_h, out_w)
+
+
+def _box_sum(values: np.ndarray, radius: int) -> np.ndarray:
+    """Sum over a (2r+1)^2 window at every pixel, via an integral image."""
+    padded = np.pad(values.astype(np.float64), radius, mode="edge")
+    integral = np.zeros((padded.shape[0] + 1, padded.shape[1] + 1))
+    integral[1:, 1:] = padded.cumsum(0).cumsum(1)
+    k = 2 * radius + 1
+    return integral[k:, k:] - integral[:-k, k:] - integral[k:, :-k] + integral[:-k, :-k]
+
+
+def adaptive_threshold(gray: np.ndarray, offset: float = 12.0, block: int = None) -> np.ndarray:
+    """Ink where a pixel is `offset` darker than its neighbourhood mean."""
+    if block is None:
+        block = max(15, min(gray.shape) // 40)
+    radius = block // 2
+    mean = _box_sum(gray, radius) / float((2 * radius + 1) ** 2)
+    return gray < mean - offset
+
+
+def sobel_edges(gray: np.ndarray, strength: float = 2.5) -> np.ndarray:
+    """Strong gradients, thresholded relative to the image's mean gradient."""
+    p = np.pad(gray, 1, mode="edge")
+    gx = (p[:-2, 2:] + 2 * p[1:-1, 2:] + p[2:, 2:]) - (p[:-2, :-2] + 2 * p[1:-1, :-2] + p[2:, :-2])
+    gy = (p[2:, :-2] + 2 * p[2:, 1:-1] + p[2:, 2:]) - (p[:-2, :-2] + 2 * p[:-2, 1:-1] + p[:-2, 2:])
+    magnitude = np.hypot(gx, gy)
+    return magnitude > magnitude.mean() * strength
+
+
+def despeckle(ink: np.ndarray, min_neighbours: int = 2) -> np.ndarray:
+    neighbours = _box_sum(ink.astype(np.float32), 1) - ink
+    return ink & (neighbours >= min_neighbours)
+
+
+def encode_png(ink: np.ndarray, color=(20, 20, 20)) -> bytes:
+    """1-bit palette PNG: index 0 transparent, index 1 the line colour."""
+    img = Image.fromarray(ink.astype(np.uint8), mode="P")
+    img.putpalette([255, 255, 255, *color])
+    buf = io.BytesIO()
+    img.save(buf, format="PNG", optimize=True, bits=1, transparency=0)
+    return buf.getvalue()
+
+
+def extract(data: bytes, corners=None, mode: str = "threshold", offset: float = 12.0) -> tuple:
+    """Run the pipeline; returns (png_bytes, width, height)."""
+    gray = load_grayscale(data)
+    if corners:
+        gray = warp_perspective(gray, corners)
+    ink = adaptive_threshold(gray, offset=offset)
+    if mode == "edges":
+        ink |= sobel_edges(gray)
+    ink = despeckle(ink)
+    return encode_png(ink), ink.shape[1], ink.shape[0]
+
+
+def prune_cache(max_bytes: int = None, keep: Path = None) -> int:
+    """Delete least recently used PNGs until the cache fits; returns files removed.
+
+    `keep` (the entry just written) is never removed. Deleting a file that
+    another worker is serving is safe: open handles and mappings outlive
+    the unlink.
+    """
+    if max_bytes is None:
+        max_bytes = CACHE_MAX_BYTES
+    entries = []
+    for path in CACHE_DIR.glob("*.png"):
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((st.st_atime, st.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        path.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+    return removed
+
+
+def _read_cached(path: Path):
+    """(width, height, size) of a cached PNG, marking it used; None if absent."""
+    try:
+        with Image.open(path) as img:
+            width, height = img.size
+        st = path.stat()
+        # Bump only the access time: mtime feeds the static ETag
+        os.utime(path, ns=(time.time_ns(), st.st_mtime_ns))
+    except FileNotFoundError:
+        return None
+    return width, height, st.st_size
+
+
+def extract_cached(data: bytes, corners=None, mode: str = "threshold", offset: float = 12.0) -> dict:
+    """extract() with a bounded on-disk cache; returns metadata and the public URL."""
+    params = {"corners": corners, "mode": mode, "offset": offset, "max_side": MAX_SIDE}
+    key = cache_key(data, params)
+    path = CACHE_DIR / f"{key}.png"
+    hit = _read_cached(path)
+    if hit:
+        width, height, size = hit
+    else:
+        png, width, height = extract(data, corners, mode, offset)
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(png)
+        os.replace(tmp, path)
+        size = len(png)
+        prune_cache(keep=path)
+    return {
+        "key": key,
+        "url": f"{CACHE_URL_PREFIX}/{key}.png",
+        "width": width,
+        "height": height,
+        "bytes": size,
+        "source_bytes": len(data),
+        "cached": hit is not None,
+    }
@@ -0,0 +1,164 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+
+# Keys whose values never reach the log stream (matched case-insensitively,
+# anywhere in a nested payload).
+SENSITIVE_KEYS = {
+    "password", "new_password", "current_password", "hashed_password",
+    "otp", "otp_code", "authorization", "secret", "secret_key", "token",
+    "session_token", "card", "cvv", "pin", "authorization_code",
+}
+REDACTED = "[REDACTED]"
+
+# Attributes every LogRecord carries; anything else came in through `extra=`.
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+def redact(value):
+    """Return a copy of value with sensitive keys masked."""
+    if isinstance(value, dict):
+        return {
+            k: REDACTED if str(k).lower() in SENSITIVE_KEYS else redact(v)
+            for k, v in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    return value
+
+
+def _parse_sample_rates(raw: str) -> dict:
+    """Parse "route=rate,route=rate" into {route: rate}."""
+    rates = {}
+    for part in filter(None, (p.strip() for p in raw.split(","))):
+        route, _, rate = part.partition("=")
+        try:
+            rates[route.strip()] = max(0.0, min(1.0, float(rate)))
+        except ValueError:
+            continue
+    return rates
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with `extra=` fields redacted and inlined."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key in _RECORD_ATTRS or key.startswith("_"):
+                continue
+            entry[key] = REDACTED if key.lower() in SENSITIVE_KEYS else redact(value)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Drop a share of INFO/DEBUG records per `route` extra; warnings always pass."""
+
+    def __init__(self, rates: dict, default: float = 1.0):
+        super().__init__()
+        self.rates = rates
+        self.default = default
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(getattr(record, "route", None), self.default)
+        return rate >= 1.0 or random.random() < rate
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that keeps exc_info for the background formatter.
+
+    The stock handler formats in the calling thread; here the caller only
+    enqueues and all formatting/serialization happens on the listener thread.
+    """
+
+    def prepare(self, record):
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+def setup_logging():
+    """Route the `archisketch` logger through a background JSON writer.
+
+    Safe to call more than once. Configured via environment:
+      LOG_LEVEL         - minimum level (default INFO)
+      LOG_SAMPLE_RATES  - per-route sampling, e.g. "check_subscription=0.1"
+      LOG_SAMPLE_DEFAULT - sampling rate for routes not listed (default 1.0)
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        log_queue = queue.SimpleQueue()
+        handler = _QueueHandler(log_queue)
+        handler.addFilter(SamplingFilter(
+            _parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", "")),
+            default=float(os.getenv("LOG_SAMPLE_DEFAULT", "1.0")),
+        ))
+
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(JsonFormatter())
+
+        root = logging.getLogger("archisketch")
+        root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+        root.handlers[:] = [handler]
+        root.propagate = False
+
+        _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the background writer."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def _restart_after_fork():
+    # The listener thread does not survive fork(); give the child its own.
+    global _listener, _setup_lock
+    _setup_lock = threading.Lock()
+    if _listener is not None:
+        _listener = None
+        setup_logging()
+
+
+os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Child of the `archisketch` logger, e.g. get_logger("paystack").
+
+    Configures logging on first use so module-level loggers work at import.
+    """
+    setup_logging()
+    return logging.getLogger(f"archisketch.{name}")
@@ -0,0 +1,62 @@
+"""Outgoing email. Sending happens in the job worker, never in a request."""
+import os
+import smtplib
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from backend import resilience
+from backend.jobs import PermanentJobError, handler
+from backend.logs import get_logger
+
+logger = get_logger("mailer")
+
+
+@handler("send_email_otp", secret=("otp_code",))
+def send_email_otp(recipient_email: str, otp_code: str):
+    """Send OTP via SMTP (Gmail App Password recommended).
+
+    Raises on SMTP failure so the job queue retries it; while the SMTP
+    breaker is open the job fails fast and is retried after its backoff.
+    """
+    EMAIL_SENDER = os.getenv("EMAIL_SENDER")
+    EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
+    SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+    SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
+    SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"
+    SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "10"))
+
+    if not EMAIL_SENDER or not EMAIL_PASSWORD:
+        raise PermanentJobError("SMTP credentials not configured (EMAIL_SENDER/EMAIL_PASSWORD)")
+
+    msg = MIMEMultipart("alternative")
+    msg["From"] = EMAIL_SENDER
+    msg["To"] = recipient_email
+    msg["Subject"] = "Your Archi Trace OTP Code"
+
+    html = f"""
+    <html>
+        <body style="font-family: Arial, sans-serif;">
+            <h2 style="color:#764ba2;">Archi Trace Verification</h2>
+            <p>Use this One-Time Password (OTP) to complete your registration:</p>
+            <h1 style="color:#764ba2;">{otp_code}</h1>
+            <p>This code will expire in 5 minutes.</p>
+        </body>
+    </html>
+    """
+
+    # Attach HTML part
+    msg.attach(MIMEText(html, "html"))
+
+    def deliver():
+        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=SMTP_TIMEOUT) as server:
+            server.ehlo()
+            if SMTP_STARTTLS:
+                server.starttls()
+                server.ehlo()
+            server.login(EMAIL_SENDER, EMAIL_PASSWORD)
+            server.sendmail(EMAIL_SENDER, recipient_email, msg.as_string())
+
+    # Connect and send
+    resilience.smtp.call(deliver)
+
+    logger.info("OTP email sent", extra={"route": "send_email_otp", "recipient": recipient_email})
@@ -1,4 +1,7 @@
 import os
+import asyncio
+import threading
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 import base64
 import requests
@@ -6,34 +9,87 @@ import json
 from datetime import datetime, timedelta
 from fastapi import FastAPI, Depends, HTTPException, Request, Response, Query, Form
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse, JSONResponse, ORJSONResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from pathlib import Path
 from pydantic import BaseModel
-from backend.db import SessionLocal, init_db
-from backend.models import User, Subscription
+from backend.db import (
+    SessionLocal, init_db, check_db, dispose_engine, get_db, get_read_db,
+    request_read_db, db_session_middleware, mark_write
+)
+from backend.logs import get_logger, shutdown_logging
+from backend.ratelimit import rate_limit
+from backend.password_policy import policy as password_policy
+from backend import blob_cache, cache_bus, entitlements, jobs, profiling, reconcile
+from backend import catalog as file_catalog  # backend.routes.catalog is `catalog` here
+from backend import mailer  # registers job handlers for RUN_JOBS_IN_WEB
+from backend.models import PendingRegistration, User, Subscription
+from backend.phones import normalize_phone
+from backend.schemas import AccessStatus, PasswordCheck, StatusMessage
 from backend.utils import hash_password
 from backend.auth import register_user, login_user
 from backend import models
-from backend.routes import admin
+from backend.routes import admin, catalog, lineart
+from backend import templates_handler
 from backend.paystack import router as paystack_router
 from fastapi import Cookie
 import random, string, re
 from passlib.context import CryptContext
 from pydantic import EmailStr
-from fastapi import BackgroundTasks
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
+from starlette.concurrency import run_in_threadpool
+
+logger = get_logger("main")
+
+
+async def _warm_up_db(app: FastAPI):
+    """Connect and run DDL after the server is up, not before it binds."""
+    try:
+        await run_in_threadpool(init_db)
+        app.state.db_ready = True
+        logger.info("Database initialized")
+    except Exception:
+        logger.exception("Database initialization failed; /readyz will retry")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.db_ready = False
+    warm_up = asyncio.create_task(_warm_up_db(app))
+    cache_bus.start()
+    reconciler = asyncio.create_task(reconcile.run_forever()) if reconcile.INTERVAL_SECONDS > 0 else None
+    catalog_scanner = asyncio.create_task(file_catalog.run_forever()) if file_catalog.SCAN_INTERVAL_SECONDS > 0 else None
+    # Local runs without a separate `python -m backend.worker` can process jobs in-process
+    job_worker = jobs.Worker() if os.getenv("RUN_JOBS_IN_WEB") == "1" else None
+    if job_worker:
+        job_thread = threading.Thread(target=job_worker.run, name="job-worker", daemon=True)
+        job_thread.start()
+    yield
+    if job_worker:
+        job_worker.stop()
+        await run_in_threadpool(job_thread.join, 30)
+    warm_up.cancel()
+    if reconciler:
+        reconciler.cancel()
+    if catalog_scanner:
+        catalog_scanner.cancel()
+    cache_bus.stop()
+    dispose_engine()
+    shutdown_logging()
+
 
 # Init FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Mount static files and include routers
 app.include_router(paystack_router)
 app.include_router(admin.router)
+app.include_router(lineart.router)
+app.include_router(catalog.router)
+app.include_router(templates_handler.router, prefix="/templates")
 
 static_dir = Path(__file__).parent.parent / "static"
 app.mount("/static", StaticFiles(directory="static", check_dir=False), name="static")
@@ -53,21 +109,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Database init
-init_db()
-
-otp_store = {}
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # ======== ADD THESE LINES ======== #
 def initialize_data():
     """Create tables and add test data if empty"""
-    from backend.models import Base
-    from sqlalchemy import create_engine
-    
     # 1. Force-create all tables
-    engine = create_engine(os.getenv("DATABASE_URL"))
-    Base.metadata.create_all(bind=engine)
+    init_db()
     
     # 2. Optional: Add test user if none exists
     db = SessionLocal()
@@ -78,26 +126,20 @@ def initialize_data():
                 email="test@example.com",
                 hashed_password=hash_password("test123"),
                 phone="08012345678",
+                phone_e164=normalize_phone("08012345678"),
                 is_first_login=True,
                 used_trial=False
             )
             db.add(test_user)
             db.commit()
-            print("✅ Created test user")
-    except Exception as e:
-        print(f"❌ Initialization error: {e}")
+            logger.info("Created test user")
+    except Exception:
+        logger.exception("Initialization error")
     finally:
         db.close()
 
 
-# Database dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
+# Database dependency: backend.db.get_db (request-scoped, connects on first use)
 # Models
 class AuthData(BaseModel):
     email: str
@@ -117,50 +159,6 @@ class SubscriptionData(BaseModel):
 SUBSCRIPTIONS_FILE = "subscriptions.txt"
 
 
-def send_email_otp(recipient_email: str, otp_code: str):
-    """Send OTP via SMTP (Gmail App Password recommended)."""
-    try:
-        EMAIL_SENDER = os.getenv("EMAIL_SENDER")
-        EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
-        SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-        SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
-
-        if not EMAIL_SENDER or not EMAIL_PASSWORD:
-            print("❌ SMTP credentials not configured (EMAIL_SENDER/EMAIL_PASSWORD).")
-            return
-
-        msg = MIMEMultipart("alternative")
-        msg["From"] = EMAIL_SENDER
-        msg["To"] = recipient_email
-        msg["Subject"] = "Your Archi Trace OTP Code"
-
-        html = f"""
-        <html>
-            <body style="font-family: Arial, sans-serif;">
-                <h2 style="color:#764ba2;">Archi Trace Verification</h2>
-                <p>Use this One-Time Password (OTP) to complete your registration:</p>
-                <h1 style="color:#764ba2;">{otp_code}</h1>
-                <p>This code will expire in 5 minutes.</p>
-            </body>
-        </html>
-        """
-
-        # Attach HTML part
-        msg.attach(MIMEText(html, "html"))
-
-        # Connect and send
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=15) as server:
-            server.ehlo()
-            server.starttls()
-            server.ehlo()
-            server.login(EMAIL_SENDER, EMAIL_PASSWORD)
-            server.sendmail(EMAIL_SENDER, recipient_email, msg.as_string())
-
-        print(f"📧 OTP email sent to {recipient_email}")
-    except Exception as e:
-        # Log full exception to server logs for debugging (no user exposure here)
-        print(f"❌ Failed to send email OTP: {e}")
-        
 # ===== Middleware ===== #
 @app.middleware("http")
 async def auth_middleware(request: Request, call_next):
@@ -168,7 +166,7 @@ async def auth_middleware(request: Request, call_next):
     public_paths = [
         "/", "/login", "/api/login", "/api/register", 
         "/static", "/onboarding", "/onboarding/images",
-        "/complete-onboarding"
+        "/complete-onboarding", "/healthz", "/readyz"
     ]
     
     if request.url.path in public_paths or request.url.path.startswith("/static"):
@@ -187,6 +185,25 @@ async def auth_middleware(request: Request, call_next):
     
     return await call_next(request)
 
+# ===== Health Checks ===== #
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz(request: Request):
+    """Readiness: the database is initialized and reachable"""
+    try:
+        if not request.app.state.db_ready:
+            await run_in_threadpool(init_db)
+            request.app.state.db_ready = True
+        await run_in_threadpool(check_db)
+    except Exception as e:
+        logger.warning("Readiness check failed", extra={"error": str(e)})
+        return JSONResponse({"status": "unavailable"}, status_code=503)
+    return {"status": "ready"}
+
 # ===== Image Serving ===== #
 @app.get("/static/onboarding/{image_name}")
 async def serve_onboarding_image(image_name: str):
@@ -217,133 +234,144 @@ async def debug_static_files():
 
 # ===== Auth Endpoints ===== #
 # ===== Auth Endpoints ===== #
-@app.post("/api/send-otp")
+@app.post("/api/send-otp", response_model=StatusMessage, dependencies=[Depends(rate_limit("send-otp"))])
 async def send_otp(
     user_data: UserRegistration,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
-    # Check if email or phone already registered
-    if db.query(User).filter(User.email == user_data.email).first():
+    phone_e164 = normalize_phone(user_data.phone)
+    if phone_e164 is None:
+        raise HTTPException(status_code=400, detail="Invalid phone number")
+
+    # Check if email or phone already registered (one indexed query for both)
+    taken = db.query(User.email, User.phone_e164).filter(
+        or_(User.email == user_data.email, User.phone_e164 == phone_e164)
+    ).limit(2).all()
+    if any(row.email == user_data.email for row in taken):
         raise HTTPException(status_code=400, detail="Email already registered")
-    if db.query(User).filter(User.phone == user_data.phone).first():
+    if taken:
         raise HTTPException(status_code=400, detail="Phone already registered")
 
     # Validate password strength
-    # Validate password strength
-    password_pattern = re.compile(
-        r"^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[@$!%*?&])[A-Za-z\d@$!%*?&]{8,}$"
-    )
-
-    if not password_pattern.match(user_data.password):
+    strength = password_policy.check(user_data.password)
+    if not strength["valid"]:
+        if not strength["rules"]["not_common"]:
+            raise HTTPException(
+                status_code=400,
+                detail="This password is too common. Please choose a different one"
+            )
         raise HTTPException(
             status_code=400,
             detail="Password must have at least 8 characters, including uppercase, lowercase, number, and special symbol"
         )
 
     otp = ''.join(random.choices(string.digits, k=6))
-    otp_store[user_data.email] = {
-        "otp": otp,
-        "expires_at": datetime.now() + timedelta(minutes=5),
-        "pending_user": {
-            "fullname": user_data.fullname,
-            "email": user_data.email,
-            "phone": user_data.phone,
-            "hashed_password": pwd_context.hash(user_data.password),
-        }
-    }
-
-    # Send OTP in background (non-blocking)
-    background_tasks.add_task(send_email_otp, user_data.email, otp)
+    # In the database rather than in memory: verify-otp may reach another worker
+    now = datetime.utcnow()
+    db.query(PendingRegistration).filter(PendingRegistration.expires_at < now).delete()
+    db.merge(PendingRegistration(
+        email=user_data.email,
+        fullname=user_data.fullname,
+        phone=user_data.phone,
+        phone_e164=phone_e164,
+        hashed_password=pwd_context.hash(user_data.password),
+        otp=otp,
+        expires_at=now + timedelta(minutes=5),
+    ))
+
+    # Sent by the job worker; pointless once the OTP itself has expired
+    jobs.enqueue(
+        db, "send_email_otp", {"recipient_email": user_data.email, "otp_code": otp},
+        deadline=datetime.utcnow() + timedelta(minutes=5)
+    )
+    db.commit()
 
-    print(f"📨 OTP for {user_data.email}: {otp}")
+    logger.info("OTP issued", extra={"route": "send_otp", "email": user_data.email})
     return {"status": "success", "message": "OTP sent successfully"}
 
-@app.post("/api/check-password")
+@app.post("/api/check-password", response_model=PasswordCheck)
 async def check_password(request: Request):
     """Live password strength checker"""
     body = await request.json()
-    password = body.get("password")
+    return password_policy.check(body.get("password"))
 
-    # Define password strength pattern
-    password_pattern = re.compile(
-        r"^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[@$!%*?&])[A-Za-z\d@$!%*?&]{8,}$"
-    )
-
-    # Check each rule
-    has_length = len(password) >= 8
-    has_upper = any(c.isupper() for c in password)
-    has_lower = any(c.islower() for c in password)
-    has_digit = any(c.isdigit() for c in password)
-    has_symbol = any(c in "@$!%*?&" for c in password)
-
-    is_strong = password_pattern.match(password) is not None
-
-    return {
-        "valid": is_strong,
-        "rules": {
-            "length": has_length,
-            "uppercase": has_upper,
-            "lowercase": has_lower,
-            "number": has_digit,
-            "symbol": has_symbol
-        }
-    }
-
-@app.post("/api/verify-otp")
+@app.post("/api/verify-otp", response_model=StatusMessage)
 async def verify_otp(request: Request, db: Session = Depends(get_db)):
     body = await request.json()
     email = body.get("email")
     otp = body.get("otp")
 
-    if email not in otp_store:
+    record = db.get(PendingRegistration, email) if email else None
+    if record is None:
         raise HTTPException(status_code=400, detail="No pending OTP for this email")
 
-    record = otp_store[email]
-    if record["otp"] != otp:
+    if record.otp != otp:
         raise HTTPException(status_code=400, detail="Invalid OTP")
 
-    if datetime.now() > record["expires_at"]:
-        del otp_store[email]
+    if datetime.utcnow() > record.expires_at:
+        db.delete(record)
+        db.commit()
         raise HTTPException(status_code=400, detail="OTP expired")
 
-    user_data = record["pending_user"]
     new_user = User(
-        fullname=user_data["fullname"],
-        email=user_data["email"],
-        phone=user_data["phone"],
-        hashed_password=user_data["hashed_password"],
+        fullname=record.fullname,
+        email=record.email,
+        phone=record.phone,
+        phone_e164=record.phone_e164,
+        hashed_password=record.hashed_password,
         is_first_login=True
     )
 
     db.add(new_user)
-    db.commit()
-    del otp_store[email]
+    db.delete(record)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Someone registered the same email or phone since the OTP was sent
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Email or phone already registered")
+    mark_write(email)
 
     return {"status": "success", "message": "Account created successfully"}
     
-@app.post("/api/resend-otp")
-async def resend_otp(request: Request):
+@app.post("/api/resend-otp", dependencies=[Depends(rate_limit("resend-otp"))])
+async def resend_otp(request: Request, db: Session = Depends(get_db)):
     body = await request.json()
-    phone = body.get("phone")
+    # Pending registrations are keyed by email, as in verify-otp; a phone is matched on its E.164 form
+    email = body.get("email")
+    if email:
+        record = db.get(PendingRegistration, email)
+    else:
+        phone_e164 = normalize_phone(body.get("phone"))
+        record = phone_e164 and db.query(PendingRegistration).filter(
+            PendingRegistration.phone_e164 == phone_e164
+        ).order_by(PendingRegistration.expires_at.desc()).first()
 
-    if phone not in otp_store:
-        raise HTTPException(status_code=404, detail="No pending registration for this phone")
+    if not record:
+        raise HTTPException(status_code=404, detail="No pending registration for this email or phone")
 
     new_otp = ''.join(random.choices(string.digits, k=6))
-    otp_store[phone]["otp"] = new_otp
-    otp_store[phone]["expires_at"] = datetime.now() + timedelta(minutes=5)
+    email = record.email
+    record.otp = new_otp
+    record.expires_at = datetime.utcnow() + timedelta(minutes=5)
 
-    print(f"🔁 Resent OTP for {phone}: {new_otp}")
+    jobs.enqueue(
+        db, "send_email_otp", {"recipient_email": email, "otp_code": new_otp},
+        deadline=datetime.utcnow() + timedelta(minutes=5)
+    )
+    db.commit()
+
+    logger.info("OTP reissued", extra={"route": "resend_otp", "email": email})
     return {"status": "resent", "message": "OTP resent successfully"}  
     
 # ===== Login (phone-based) =====
-@app.post("/api/login")
+@app.post("/api/login", dependencies=[Depends(rate_limit("login"))])
 def login(response: Response, payload: dict, db: Session = Depends(get_db)):
-    phone = payload.get("phone")
+    # Primary, not the replica: a fresh signup has no email yet to pin reads on
+    phone_e164 = normalize_phone(payload.get("phone"))
     password = payload.get("password")
 
-    user = db.query(User).filter(User.phone == phone).first()
+    user = db.query(User).filter(User.phone_e164 == phone_e164).first() if phone_e164 else None
     if not user:
         raise HTTPException(status_code=401, detail="Phone not registered")
 
@@ -379,6 +407,7 @@ async def complete_onboarding(
         # Mark onboarding as complete
         user.is_first_login = False
         db.commit()
+        mark_write(user.email)
         
         # Redirect directly to dashboard with authenticated session
         response = RedirectResponse(url="/dashboard.html", status_code=303)
@@ -457,10 +486,10 @@ def onboarding(request: Request):
         "user_id": user_id
     })
 
-@app.get("/api/check-access")
+@app.get("/api/check-access", response_model=AccessStatus, response_model_exclude_none=True)
 async def check_access(
     request: Request,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user_email: str = Cookie(None)
 ):
     """Check if logged-in user has an active subscription"""
@@ -485,43 +514,62 @@ async def check_access(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
         
+def _session_cookies(request: Request):
+    """(session_token, user_email) as check_subscription_middleware reads them"""
+    session_token = request.cookies.get("session_token")
+    user_email = request.cookies.get("user_email") or request.query_params.get("email")
+    return session_token, user_email
+
+
 @app.middleware("http")
 async def check_subscription_middleware(request: Request, call_next):
     # Public routes
     PUBLIC_ROUTES = [
         "/", "/login", "/api/login", "/api/register",
-        "/payment", "/payment-success", "/static"
+        "/payment", "/payment-success", "/static",
+        "/healthz", "/readyz"
     ]
     
     if request.url.path in PUBLIC_ROUTES:
         return await call_next(request)
     
     # Verify authentication
-    session_token = request.cookies.get("session_token")
-    user_email = request.cookies.get("user_email") or request.query_params.get("email")
+    session_token, user_email = _session_cookies(request)
     
     if not (session_token and user_email):
         return RedirectResponse(url="/login")
     
     # AR route specific checks
     if request.url.path.startswith("/ar"):
-        db = SessionLocal()
+        # Shared with the handler and closed by db_session_middleware
+        db = request_read_db(request)
         try:
-            active_sub = db.query(Subscription).filter(
-                Subscription.user_email == user_email,
-                Subscription.expiry_date > datetime.now()
-            ).first()
-            
-            if not active_sub:
+            expiry = await run_in_threadpool(entitlements.active_expiry, db, user_email)
+
+            if expiry is None:
                 return RedirectResponse(url="/payment")
         except Exception as e:
-            print(f"Subscription check error: {str(e)}")
+            logger.warning("Subscription check error", extra={"route": "ar_middleware", "error": str(e)})
             return RedirectResponse(url="/payment")
-        finally:
-            db.close()
     
     return await call_next(request)
 
+# Registered last so it wraps every other middleware and owns the request's sessions
+app.middleware("http")(db_session_middleware)
+# Outside the session middleware so profiles include session setup and teardown
+app.middleware("http")(profiling.profiling_middleware)
+
+
+def _static_allowed(request: Request) -> bool:
+    """What the stack requires for /static/*: auth_middleware lets it through,
+    check_subscription_middleware wants both session cookies (see
+    backend.tools.blob_cache_auth_check)"""
+    session_token, user_email = _session_cookies(request)
+    return bool(session_token and user_email)
+
+# Outermost: hot template blobs are answered before the rest of the stack runs
+app.add_middleware(blob_cache.BlobCacheMiddleware, allow=_static_allowed)
+
 @app.get("/payment")
 async def payment_page(request: Request):
     return templates.TemplateResponse("payment.html", {"request": request})
@@ -561,6 +609,8 @@ async def payment_success(
 
         db.commit()
         db.refresh(subscription)
+        mark_write(user_email)
+        entitlements.invalidate(user_email)
 
         return {
             "status": "success",
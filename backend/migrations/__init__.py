@@ -0,0 +1,223 @@
+"""Versioned schema migrations.
+
+Each module in backend/migrations/versions is named NNNN_description.py and
+defines `upgrade(op)`. Applied versions are recorded in `schema_migrations`.
+Steps should be idempotent (IF NOT EXISTS, guarded backfills) so a run that
+stops halfway can simply be repeated.
+
+Operations that would lock hot tables avoid doing so: on Postgres indexes
+are built with CREATE INDEX CONCURRENTLY outside a transaction, and data
+backfills run in small batches, each in its own short transaction.
+
+Fresh databases already match the models, so they are stamped with the
+latest version instead of being migrated: init_db() does this at startup,
+and upgrade() does the same when it finds no `users` table (a release
+step running before the app has ever started).
+"""
+import importlib
+import pkgutil
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, bindparam, inspect, text
+
+from backend.logs import get_logger
+
+logger = get_logger("migrations")
+
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _metadata,
+    Column("version", String(32), primary_key=True),
+    Column("description", String(255)),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+_LOCK_ID = 0x41524d47  # "ARMG": one migrator at a time
+
+
+class Migration:
+    def __init__(self, version: str, description: str, module):
+        self.version = version
+        self.description = description
+        self.module = module
+
+
+def discover():
+    """All migrations in version order."""
+    from backend.migrations import versions
+
+    found = []
+    for info in pkgutil.iter_modules(versions.__path__):
+        version, _, description = info.name.partition("_")
+        if not version.isdigit():
+            continue
+        module = importlib.import_module(f"{versions.__name__}.{info.name}")
+        found.append(Migration(version, description.replace("_", " "), module))
+    return sorted(found, key=lambda m: m.version)
+
+
+class Operations:
+    """What a migration's upgrade(op) may do."""
+
+    def __init__(self, engine, dry_run: bool = False):
+        self.engine = engine
+        self.dialect = engine.dialect.name
+        self.dry_run = dry_run
+
+    def _autocommit(self, sql: str, params: dict = None):
+        logger.info("Migration SQL", extra={"sql": sql})
+        if self.dry_run:
+            return
+        with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(sql), params or {})
+
+    def execute(self, sql: str, params: dict = None) -> int:
+        """Run one statement in its own transaction; returns the row count."""
+        logger.info("Migration SQL", extra={"sql": sql})
+        if self.dry_run:
+            return 0
+        with self.engine.begin() as conn:
+            return conn.execute(text(sql), params or {}).rowcount
+
+    def fetch(self, sql: str, params: dict = None, expanding=()) -> list:
+        """Rows of a query; parameters named in `expanding` take lists (`IN :name`)."""
+        stmt = text(sql).bindparams(*(bindparam(name, expanding=True) for name in expanding))
+        with self.engine.connect() as conn:
+            return conn.execute(stmt, params or {}).fetchall()
+
+    def execute_many(self, sql: str, rows: list) -> int:
+        """Run one statement per parameter set, all in one transaction."""
+        if self.dry_run or not rows:
+            return 0
+        with self.engine.begin() as conn:
+            return conn.execute(text(sql), rows).rowcount
+
+    def has_table(self, table: str) -> bool:
+        return inspect(self.engine).has_table(table)
+
+    def has_column(self, table: str, column: str) -> bool:
+        return any(c["name"] == column for c in inspect(self.engine).get_columns(table))
+
+    def add_column(self, table: str, column: str, ddl_type: str):
+        """Add a nullable column (a metadata-only change on Postgres)."""
+        if not self.has_column(table, column):
+            self.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}")
+
+    def create_index(self, name: str, table: str, columns, unique: bool = False, where: str = None):
+        """Build an index without blocking writes where the database allows it."""
+        unique_sql = "UNIQUE " if unique else ""
+        where_sql = f" WHERE {where}" if where else ""
+        cols = ", ".join(columns)
+        if self.dialect == "postgresql":
+            # A failed concurrent build leaves an INVALID index behind; drop it and retry.
+            invalid = self.fetch(
+                "SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+                "WHERE c.relname = :name AND NOT i.indisvalid", {"name": name}
+            )
+            if invalid:
+                self._autocommit(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            self._autocommit(
+                f"CREATE {unique_sql}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({cols}){where_sql}"
+            )
+        else:
+            self.execute(f"CREATE {unique_sql}INDEX IF NOT EXISTS {name} ON {table} ({cols}){where_sql}")
+
+    def drop_index(self, name: str):
+        if self.dialect == "postgresql":
+            self._autocommit(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        else:
+            self.execute(f"DROP INDEX IF EXISTS {name}")
+
+    def backfill(self, sql: str, batch_size: int = 1000, params: dict = None) -> int:
+        """Repeat a batched UPDATE until it touches no rows.
+
+        `sql` must limit itself to :batch_size rows per run (typically
+        `WHERE id IN (SELECT id ... LIMIT :batch_size)`) and must stop
+        matching rows it has already fixed.
+        """
+        total = 0
+        while True:
+            rows = self.execute(sql, {**(params or {}), "batch_size": batch_size})
+            if rows <= 0:
+                break
+            total += rows
+            logger.info("Backfill batch", extra={"rows": rows, "total": total})
+        return total
+
+
+def _applied(conn) -> dict:
+    rows = conn.execute(schema_migrations.select()).mappings()
+    return {row["version"]: row for row in rows}
+
+
+def status(engine):
+    """[(version, description, applied_at or None)] for every known migration."""
+    _metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        applied = _applied(conn)
+    return [
+        (m.version, m.description, applied[m.version]["applied_at"] if m.version in applied else None)
+        for m in discover()
+    ]
+
+
+def stamp(engine, target: str = None):
+    """Mark migrations up to target (default: all) as applied without running them."""
+    _metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        applied = _applied(conn)
+        for m in discover():
+            if target is not None and m.version > target:
+                break
+            if m.version not in applied:
+                conn.execute(schema_migrations.insert().values(
+                    version=m.version, description=m.description, applied_at=datetime.utcnow()
+                ))
+
+
+def _create_fresh(engine, dry_run: bool) -> list:
+    """What init_db() does for a brand-new database: tables from the models, then stamp."""
+    from backend.models import Base
+
+    versions = [m.version for m in discover()]
+    logger.info("Empty database: creating the current schema", extra={"dry_run": dry_run})
+    if not dry_run:
+        Base.metadata.create_all(bind=engine)
+        stamp(engine)
+    return versions
+
+
+def upgrade(engine, target: str = None, dry_run: bool = False):
+    """Apply pending migrations in order; returns the versions applied."""
+    _metadata.create_all(bind=engine)
+    lock = None
+    if engine.dialect.name == "postgresql":
+        # Session-level lock on an autocommit connection, so it holds no
+        # snapshot that CREATE INDEX CONCURRENTLY would have to wait out.
+        lock = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        lock.execute(text("SELECT pg_advisory_lock(:id)"), {"id": _LOCK_ID})
+    try:
+        if not inspect(engine).has_table("users"):
+            return _create_fresh(engine, dry_run)
+        with engine.connect() as conn:
+            applied = _applied(conn)
+        done = []
+        op = Operations(engine, dry_run=dry_run)
+        for m in discover():
+            if target is not None and m.version > target:
+                break
+            if m.version in applied:
+                continue
+            logger.info("Applying migration", extra={"version": m.version, "description": m.description})
+            m.module.upgrade(op)
+            if not dry_run:
+                with engine.begin() as conn:
+                    conn.execute(schema_migrations.insert().values(
+                        version=m.version, description=m.description, applied_at=datetime.utcnow()
+                    ))
+            done.append(m.version)
+        return done
+    finally:
+        if lock is not None:
+            lock.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": _LOCK_ID})
+            lock.close()
@@ -0,0 +1,10 @@
+"""Indexes for phone login and the per-user active-subscription lookup."""
+
+
+def upgrade(op):
+    if not op.has_table("users"):
+        return  # a fresh schema comes from the models (init_db, upgrade)
+    op.create_index("ix_users_phone", "users", ["phone"])
+    op.create_index(
+        "ix_subscriptions_user_email_expiry_date", "subscriptions", ["user_email", "expiry_date"]
+    )
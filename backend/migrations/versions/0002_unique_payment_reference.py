@@ -0,0 +1,24 @@
+"""One subscription per Paystack reference.
+
+Rows created by repeated verify callbacks share a reference; all but the
+earliest get a "#dup-<id>" suffix so the unique index can be built.
+"""
+
+
+def upgrade(op):
+    op.backfill("""
+        UPDATE subscriptions
+        SET payment_reference = payment_reference || '#dup-' || CAST(id AS VARCHAR(20))
+        WHERE id IN (
+            SELECT s.id FROM subscriptions s
+            WHERE s.payment_reference IS NOT NULL
+              AND EXISTS (
+                  SELECT 1 FROM subscriptions o
+                  WHERE o.payment_reference = s.payment_reference AND o.id < s.id
+              )
+            LIMIT :batch_size
+        )
+    """)
+    op.create_index(
+        "uq_subscriptions_payment_reference", "subscriptions", ["payment_reference"], unique=True
+    )
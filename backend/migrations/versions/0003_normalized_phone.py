@@ -0,0 +1,67 @@
+"""Normalized E.164 phone numbers for login and signup lookups.
+
+Adds users.phone_e164, fills it in batches from users.phone using the same
+normalization as the app, then builds a unique index on it and drops the
+index on the raw column, which nothing queries any more.
+
+When several existing accounts normalize to the same number, the oldest
+keeps it; the others are left NULL (logged) and can no longer log in by
+phone until their number is corrected.
+"""
+from backend.logs import get_logger
+from backend.phones import normalize_phone
+
+logger = get_logger("migrations")
+
+BATCH_SIZE = 1000
+
+
+def upgrade(op):
+    op.add_column("users", "phone_e164", "VARCHAR(16)")
+    if op.dry_run:
+        # The column was not really added, so there is nothing to read yet
+        logger.info("Dry run: skipping phone_e164 backfill")
+    else:
+        _backfill(op)
+
+    op.create_index("uq_users_phone_e164", "users", ["phone_e164"], unique=True)
+    op.drop_index("ix_users_phone")
+
+
+def _backfill(op):
+    last_id = 0
+    while True:
+        rows = op.fetch(
+            "SELECT id, phone FROM users WHERE id > :last_id AND phone_e164 IS NULL "
+            "AND phone IS NOT NULL ORDER BY id LIMIT :batch_size",
+            {"last_id": last_id, "batch_size": BATCH_SIZE},
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        wanted = {}
+        for user_id, phone in rows:
+            e164 = normalize_phone(phone)
+            if e164 is None:
+                logger.warning("Phone not normalizable", extra={"user_id": user_id})
+            elif e164 in wanted:
+                logger.warning("Duplicate phone left unset", extra={"user_id": user_id, "kept": wanted[e164]})
+            else:
+                wanted[e164] = user_id
+        if not wanted:
+            continue
+
+        taken = {
+            e164: user_id for user_id, e164 in op.fetch(
+                "SELECT id, phone_e164 FROM users WHERE phone_e164 IN :numbers",
+                {"numbers": list(wanted)}, expanding=("numbers",),
+            )
+        }
+        updates = []
+        for e164, user_id in wanted.items():
+            if e164 in taken:
+                logger.warning("Duplicate phone left unset", extra={"user_id": user_id, "kept": taken[e164]})
+            else:
+                updates.append({"id": user_id, "phone_e164": e164})
+        op.execute_many("UPDATE users SET phone_e164 = :phone_e164 WHERE id = :id", updates)
@@ -0,0 +1,11 @@
+"""Perceptual hashes on catalog rows, for template duplicate detection.
+
+The next catalog scan fills them in for existing templates.
+"""
+
+
+def upgrade(op):
+    if not op.has_table("catalog_items"):
+        return  # created with these columns by init_db()
+    op.add_column("catalog_items", "dhash", "VARCHAR(16)")
+    op.add_column("catalog_items", "phash", "VARCHAR(16)")
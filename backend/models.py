@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, ForeignKey, Index, Text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship  # <-- ADD THIS IMPORT
 from datetime import datetime
@@ -10,7 +10,8 @@ class User(Base):
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     fullname = Column(String(100))
-    phone = Column(String(20))
+    phone = Column(String(20))  # as typed
+    phone_e164 = Column(String(16))  # normalized (backend/phones.py); used for lookups
     email = Column(String(255), unique=True, index=True)
     hashed_password = Column(String(255), nullable=False)
     is_first_login = Column(Boolean, default=True, nullable=False)
@@ -20,6 +21,10 @@ class User(Base):
     # Now properly defined relationship
     subscriptions = relationship("Subscription", back_populates="user")
 
+    __table_args__ = (
+        Index("uq_users_phone_e164", "phone_e164", unique=True),
+    )
+
 class Subscription(Base):
     __tablename__ = "subscriptions"
     
@@ -35,3 +40,98 @@ class Subscription(Base):
     
     # Relationship back to User
     user = relationship("User", back_populates="subscriptions")
+
+    # Named to match backend/migrations so fresh and migrated schemas agree
+    __table_args__ = (
+        Index("ix_subscriptions_user_email_expiry_date", "user_email", "expiry_date"),
+        Index("uq_subscriptions_payment_reference", "payment_reference", unique=True),  # one subscription per Paystack reference
+    )
+
+
+class PendingTransaction(Base):
+    """A Paystack transaction we initialized but have not settled yet.
+
+    status: pending -> success | failed | reversed | expired
+    """
+    __tablename__ = "pending_transactions"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    reference = Column(String(100), unique=True, index=True, nullable=False)
+    user_email = Column(String(255), nullable=False)
+    amount_kobo = Column(Integer, nullable=False)
+    status = Column(String(20), default="pending", nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    settled_at = Column(DateTime)
+
+
+class RateLimitBucket(Base):
+    """Token-bucket state shared by all workers (see backend/ratelimit.py)."""
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String(255), primary_key=True)
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False)  # epoch seconds
+    allowed = Column(Boolean, nullable=False, default=True)
+
+
+class PendingRegistration(Base):
+    """A signup waiting for its email OTP, shared by all workers.
+
+    Created by /api/send-otp, replaced by a new send or resend, and deleted
+    once verified or found expired; send-otp also clears expired rows.
+    """
+    __tablename__ = "pending_registrations"
+
+    email = Column(String(255), primary_key=True)
+    fullname = Column(String(100))
+    phone = Column(String(20))  # as typed
+    phone_e164 = Column(String(16), nullable=False, index=True)
+    hashed_password = Column(String(255), nullable=False)
+    otp = Column(String(6), nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)  # UTC
+
+
+class CatalogItem(Base):
+    """One file the offline app can sync (see backend/catalog.py).
+
+    `version` is the catalog version at which the row last changed; removed
+    files stay as tombstones (deleted=True) so clients learn to drop them.
+    """
+    __tablename__ = "catalog_items"
+
+    path = Column(String(512), primary_key=True)  # relative to static/
+    sha256 = Column(String(64))
+    size = Column(Integer, nullable=False, default=0)
+    mtime = Column(Float, nullable=False, default=0.0)
+    version = Column(Integer, nullable=False, index=True)
+    deleted = Column(Boolean, nullable=False, default=False)
+    # Perceptual hashes of templates as hex (backend/phash.py); "" = not an image
+    dhash = Column(String(16))
+    phash = Column(String(16))
+
+
+class Job(Base):
+    """A unit of background work (see backend/jobs.py).
+
+    status: queued -> running -> done, or back to queued for a retry, or
+    dead once max_attempts is used up or the deadline has passed.
+    """
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String(64), nullable=False)
+    payload = Column(Text, nullable=False, default="{}")  # JSON
+    status = Column(String(20), nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    deadline = Column(DateTime)  # not worth running after this
+    locked_by = Column(String(100))
+    locked_at = Column(DateTime)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+    )
@@ -0,0 +1,119 @@
+import hashlib
+import math
+import mmap
+import os
+import re
+import struct
+from pathlib import Path
+
+from backend.logs import get_logger
+
+logger = get_logger("password_policy")
+
+SYMBOLS = "@$!%*?&"
+MIN_LENGTH = 8
+DEFAULT_FILTER_PATH = Path(__file__).parent / "data" / "common_passwords.bloom"
+
+# Compiled once at import; check() runs on every keystroke of the signup form.
+_STRONG = re.compile(
+    r"^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[@$!%*?&])[A-Za-z\d@$!%*?&]{8,}$"
+)
+_UPPER = re.compile(r"[A-Z]")
+_LOWER = re.compile(r"[a-z]")
+_DIGIT = re.compile(r"\d")
+_SYMBOL = re.compile(f"[{re.escape(SYMBOLS)}]")
+
+
+class BloomFilter:
+    """Read-only Bloom filter over a memory-mapped file.
+
+    Layout: 8-byte magic, little-endian u64 bit count, u32 hash count,
+    padding to 32 bytes, then the bit array. Lookups touch k bytes of the
+    mapping, and the pages are shared through the page cache by every
+    worker that opens the same file.
+    """
+
+    MAGIC = b"ASBLOOM1"
+    HEADER = struct.Struct("<8sQI12x")
+
+    def __init__(self, buffer, num_bits: int, num_hashes: int, offset: int = 0):
+        self._buf = buffer
+        self._offset = offset
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+
+    @staticmethod
+    def _positions(word: str, num_bits: int, num_hashes: int):
+        # Kirsch-Mitzenmacher double hashing from one 128-bit digest.
+        digest = hashlib.blake2b(word.lower().encode("utf-8"), digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", digest)
+        h2 |= 1
+        return [(h1 + i * h2) % num_bits for i in range(num_hashes)]
+
+    def __contains__(self, word: str) -> bool:
+        buf, offset = self._buf, self._offset
+        for pos in self._positions(word, self.num_bits, self.num_hashes):
+            if not buf[offset + (pos >> 3)] & (1 << (pos & 7)):
+                return False
+        return True
+
+    @classmethod
+    def build(cls, words, capacity: int, fp_rate: float = 0.001) -> bytes:
+        """Serialize a filter sized for `capacity` words at `fp_rate`."""
+        capacity = max(1, capacity)
+        num_bits = max(8, int(-capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        num_bits = (num_bits + 7) // 8 * 8
+        num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+
+        bits = bytearray(num_bits // 8)
+        for word in words:
+            for pos in cls._positions(word, num_bits, num_hashes):
+                bits[pos >> 3] |= 1 << (pos & 7)
+        return cls.HEADER.pack(cls.MAGIC, num_bits, num_hashes) + bytes(bits)
+
+    @classmethod
+    def open(cls, path) -> "BloomFilter":
+        with open(path, "rb") as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, num_bits, num_hashes = cls.HEADER.unpack_from(buf, 0)
+        if magic != cls.MAGIC or len(buf) < cls.HEADER.size + num_bits // 8:
+            buf.close()
+            raise ValueError(f"{path} is not a password filter file")
+        return cls(buf, num_bits, num_hashes, offset=cls.HEADER.size)
+
+
+class PasswordPolicy:
+    """Character-class rules plus an optional common/breached password filter."""
+
+    def __init__(self, blocklist: BloomFilter = None):
+        self.blocklist = blocklist
+
+    @classmethod
+    def from_env(cls) -> "PasswordPolicy":
+        path = os.getenv("PASSWORD_FILTER_PATH", str(DEFAULT_FILTER_PATH))
+        try:
+            return cls(BloomFilter.open(path))
+        except (OSError, ValueError) as e:
+            logger.warning("Password blocklist not loaded", extra={"path": path, "error": str(e)})
+            return cls()
+
+    def is_common(self, password: str) -> bool:
+        return self.blocklist is not None and password in self.blocklist
+
+    def check(self, password: str) -> dict:
+        """Return {"valid": bool, "rules": {...}} in the /api/check-password shape."""
+        password = password or ""
+        rules = {
+            "length": len(password) >= MIN_LENGTH,
+            "uppercase": _UPPER.search(password) is not None,
+            "lowercase": _LOWER.search(password) is not None,
+            "number": _DIGIT.search(password) is not None,
+            "symbol": _SYMBOL.search(password) is not None,
+        }
+        strong = _STRONG.match(password) is not None
+        # Only pay for the filter lookup once the cheap rules pass.
+        rules["not_common"] = not (strong and self.is_common(password))
+        return {"valid": strong and rules["not_common"], "rules": rules}
+
+
+policy = PasswordPolicy.from_env()
@@ -1,34 +1,72 @@
 import os
+import hashlib
+import orjson
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Request, HTTPException, Depends
+from fastapi import APIRouter, Request, Response, HTTPException, Depends, Cookie
 from fastapi.responses import JSONResponse, RedirectResponse
 import requests
 import base64
-from backend.db import SessionLocal
-from backend.models import User, Subscription
+from backend.db import SessionLocal, get_db, get_read_db, mark_write
+from backend.singleflight import Group
+from backend.logs import get_logger
+from backend.ratelimit import rate_limit
+from backend import entitlements, resilience
+from backend.models import User, Subscription, PendingTransaction
+from backend.phones import normalize_phone
+from backend.schemas import Me, StatusMessage, SubscriptionStatus, UserProfile
+from sqlalchemy import and_
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from passlib.context import CryptContext
 
 
 router = APIRouter()
+logger = get_logger("paystack")
 
 # Paystack configuration
 PAYSTACK_SECRET_KEY = os.getenv("PAYSTACK_SECRET_KEY")
+PAYSTACK_API_BASE = os.getenv("PAYSTACK_API_BASE", "https://api.paystack.co").rstrip("/")
+# (connect, read) seconds; a slow gateway should trip the breaker, not hold threads
+PAYSTACK_TIMEOUT = (float(os.getenv("PAYSTACK_CONNECT_TIMEOUT", "3")), float(os.getenv("PAYSTACK_READ_TIMEOUT", "8")))
 BASE_URL = os.getenv("BASE_URL")  # Your frontend URL (e.g., "https://yourdomain.com")
 WEEKLY_SUBSCRIPTION_AMOUNT = 100 * 300  # 20000 Naira in kobo (₦20,000)
 TRIAL_DURATION_HOURS = 1  # 1 hour trial
+ME_MAX_AGE_SECONDS = 60  # browser cache ceiling for /api/me while a plan is active
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+DAILY_ACCESS_AMOUNT_NAIRA = 300
+DAILY_ACCESS_DAYS = 1
+
+# In-flight /verify-paystack-payment calls, keyed by payment reference
+verifications = Group()
 
 def get_paystack_auth_header():
     return {"Authorization": f"Bearer {PAYSTACK_SECRET_KEY}"}
 
+def gateway_unavailable(e: resilience.UpstreamUnavailable) -> HTTPException:
+    return HTTPException(status_code=503, detail="Payment gateway unavailable, try again shortly",
+                         headers={"Retry-After": str(e.retry_after)})
+
+def grant_paid_subscription(db: Session, user: User, reference: str, amount_naira: float = DAILY_ACCESS_AMOUNT_NAIRA):
+    """Add the paid subscription for a settled reference; the caller commits."""
+    expiry_date = datetime.utcnow() + timedelta(days=DAILY_ACCESS_DAYS)
+    subscription = Subscription(
+        user_id=user.id,
+        user_email=user.email,
+        expiry_date=expiry_date,
+        is_trial=False,
+        amount_paid=amount_naira,
+        payment_reference=reference,
+        is_active=True
+    )
+    db.add(subscription)
+
+    # Update user's last subscription date
+    user.last_subscription_date = datetime.now()
+    user.used_trial = True  # If you want to mark trial as used
+    return subscription
+
 @router.post("/initiate-trial")
 async def start_trial(request: Request, db: Session = Depends(get_db)):
     try:
@@ -62,6 +100,8 @@ async def start_trial(request: Request, db: Session = Depends(get_db)):
         )
         db.add(subscription)
         db.commit()
+        mark_write(email)
+        entitlements.invalidate(email)
         
         return JSONResponse({
             "status": "success",
@@ -87,7 +127,7 @@ async def initiate_payment(request: Request, db: Session = Depends(get_db)):
         transaction_ref = f"AT-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{random.randint(1000,9999)}"
         
         # Convert N300 to kobo (₦300 × 100)
-        amount_in_kobo = 300 * 100
+        amount_in_kobo = DAILY_ACCESS_AMOUNT_NAIRA * 100
         
         payload = {
             "email": email,
@@ -110,23 +150,32 @@ async def initiate_payment(request: Request, db: Session = Depends(get_db)):
             "Content-Type": "application/json"
         }
 
-        print(f"Payload to Paystack: {payload}")  # Debug log
+        logger.debug("Initializing Paystack transaction",
+                     extra={"route": "initiate_payment", "payload": payload})
 
-        # Add timeout and better error handling
+        # Off the event loop, behind the Paystack breaker and bulkhead
         try:
-            response = requests.post(
-                "https://api.paystack.co/transaction/initialize",
+            response = await resilience.paystack.acall(
+                requests.post,
+                f"{PAYSTACK_API_BASE}/transaction/initialize",
                 json=payload,
                 headers=headers,
-                timeout=10  # 10-second timeout
+                timeout=PAYSTACK_TIMEOUT
             )
             response.raise_for_status()  # Raises exception for 4XX/5XX
+        except resilience.UpstreamUnavailable as e:
+            logger.warning("Paystack call rejected",
+                           extra={"route": "initiate_payment", "reference": transaction_ref, "reason": e.reason})
+            raise gateway_unavailable(e)
         except requests.exceptions.RequestException as e:
-            print(f"Paystack API request failed: {str(e)}")
+            logger.warning("Paystack API request failed",
+                           extra={"route": "initiate_payment", "reference": transaction_ref, "error": str(e)})
             raise HTTPException(status_code=502, detail="Payment gateway unavailable")
 
         response_data = response.json()
-        print(f"Paystack response: {response_data}")
+        logger.debug("Paystack initialize response",
+                     extra={"route": "initiate_payment", "reference": transaction_ref,
+                            "paystack_status": response_data.get("status")})
 
         if not response_data.get("status"):
             raise HTTPException(status_code=502, detail="Invalid response from Paystack")
@@ -134,6 +183,14 @@ async def initiate_payment(request: Request, db: Session = Depends(get_db)):
         if not response_data["data"].get("authorization_url"):
             raise HTTPException(status_code=502, detail="No payment URL received from Paystack")
 
+        # Recorded so the reconciliation job can settle it if the callback never arrives
+        db.add(PendingTransaction(
+            reference=transaction_ref,
+            user_email=email,
+            amount_kobo=amount_in_kobo
+        ))
+        await run_in_threadpool(db.commit)
+
         return {
             "status": "success",
             "payment_url": response_data["data"]["authorization_url"]
@@ -142,83 +199,110 @@ async def initiate_payment(request: Request, db: Session = Depends(get_db)):
     except HTTPException:
         raise  # Re-raise existing HTTP exceptions
     except Exception as e:
-        print(f"Unexpected error in initiate-payment: {str(e)}")
+        logger.exception("Unexpected error in initiate-payment", extra={"route": "initiate_payment"})
         raise HTTPException(status_code=500, detail="Internal server error")
         
+def _settle_verified_payment(email: str, payment_ref: str) -> str:
+    """Record a payment Paystack reported as successful; safe to repeat."""
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.email == email).first()
+        if not user:
+            return "user_not_found"
+
+        subscription = grant_paid_subscription(db, user, payment_ref)
+        db.query(PendingTransaction).filter(
+            PendingTransaction.reference == payment_ref
+        ).update({"status": "success", "settled_at": datetime.utcnow()})
+        try:
+            db.commit()
+        except IntegrityError:
+            # Unique payment_reference: another worker or the reconciler got there first
+            db.rollback()
+            return "success"
+
+        mark_write(email)
+        entitlements.invalidate(email)
+        logger.info("New subscription created", extra={
+            "route": "verify_payment",
+            "user_id": user.id,
+            "amount": subscription.amount_paid,
+            "expires": subscription.expiry_date.isoformat(),
+            "reference": payment_ref,
+        })
+        return "success"
+    finally:
+        db.close()
+
+
+async def _verify_with_paystack(email: str, payment_ref: str) -> str:
+    verify_response = await resilience.paystack.acall(
+        requests.get,
+        f"{PAYSTACK_API_BASE}/transaction/verify/{payment_ref}",
+        headers=get_paystack_auth_header(),
+        timeout=PAYSTACK_TIMEOUT
+    )
+
+    if verify_response.status_code != 200:
+        logger.warning("Paystack verification failed",
+                       extra={"route": "verify_payment", "reference": payment_ref,
+                              "status_code": verify_response.status_code})
+        return "verification_failed"
+
+    payment_data = verify_response.json()
+    if payment_data["data"]["status"] != "success":
+        return "not_completed"
+
+    return await run_in_threadpool(_settle_verified_payment, email, payment_ref)
+
+
 @router.get("/verify-paystack-payment")
 async def verify_payment(
     email: str,
     reference: str = None,
     trxref: str = None,  # Paystack may use either
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
+    # Use either reference or trxref
+    payment_ref = reference or trxref
+    if not payment_ref:
+        raise HTTPException(status_code=400, detail="Payment reference required")
+
     try:
-        # Use either reference or trxref
-        payment_ref = reference or trxref
-        if not payment_ref:
-            raise HTTPException(status_code=400, detail="Payment reference required")
-
-        # Verify payment with Paystack
-        verify_response = requests.get(
-            f"https://api.paystack.co/transaction/verify/{payment_ref}",
-            headers=get_paystack_auth_header()
-        )
-        
-        if verify_response.status_code != 200:
-            print(f"Paystack verification failed for reference {payment_ref}")
-            raise HTTPException(status_code=400, detail="Payment verification failed")
-        
-        payment_data = verify_response.json()
-        if payment_data["data"]["status"] == "success":
-            # Grant 1-day access
-            expiry_date = datetime.utcnow() + timedelta(days=1)
-            
-            # Get or create user
-            user = db.query(User).filter(User.email == email).first()
-            if not user:
-                raise HTTPException(status_code=404, detail="User not found")
-            
-            # Create new subscription
-            subscription = Subscription(
-                user_id=user.id,
-                user_email=email,
-                expiry_date=expiry_date,
-                is_trial=False,
-                amount_paid=300,  # ₦5000 in Naira (not kobo)
-                payment_reference=payment_ref,
-                is_active=True
-            )
-            db.add(subscription)
-            
-            # Update user's last subscription date
-            user.last_subscription_date = datetime.now()
-            user.used_trial = True  # If you want to mark trial as used
-            
-            db.commit()
-            
-            # Log successful subscription
-            print(f"""
-            🟢 NEW SUBSCRIPTION CREATED
-            User: {email} (ID: {user.id})
-            Amount: ₦{300}
-            Expires: {expiry_date}
-            Reference: {payment_ref}
-            """)
-            
+        # Refreshes and double redirects of a settled payment never leave the process
+        settled = db.query(Subscription.id).filter(
+            Subscription.payment_reference == payment_ref
+        ).first()
+        if settled:
             return RedirectResponse(url="/ar?payment=success")
-        
-        raise HTTPException(status_code=400, detail="Payment not completed")
-    
+
+        # Concurrent callbacks for one reference share a single Paystack call
+        outcome = await verifications.do(payment_ref, _verify_with_paystack, email, payment_ref)
+    except (resilience.UpstreamUnavailable, requests.exceptions.RequestException) as e:
+        # The reconciler settles the reference once Paystack is reachable again
+        logger.warning("Paystack verification unavailable",
+                       extra={"route": "verify_payment", "reference": payment_ref, "error": str(e)})
+        if isinstance(e, resilience.UpstreamUnavailable):
+            raise gateway_unavailable(e)
+        raise HTTPException(status_code=502, detail="Payment gateway unavailable")
     except Exception as e:
         db.rollback()
-        print(f"🔴 Payment verification error: {str(e)}")
+        logger.exception("Payment verification error",
+                         extra={"route": "verify_payment", "reference": payment_ref})
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/check-subscription")
-async def check_subscription(email: str, db: Session = Depends(get_db)):
+    if outcome == "success":
+        return RedirectResponse(url="/ar?payment=success")
+    if outcome == "user_not_found":
+        raise HTTPException(status_code=404, detail="User not found")
+    if outcome == "verification_failed":
+        raise HTTPException(status_code=400, detail="Payment verification failed")
+    raise HTTPException(status_code=400, detail="Payment not completed")
+
+@router.get("/check-subscription", response_model=SubscriptionStatus, response_model_exclude_none=True)
+async def check_subscription(email: str, db: Session = Depends(get_read_db)):
     """Check if user has active subscription (even after logout)"""
     try:
-        print(f"\n🔍 [DEBUG] Checking subscription for: {email}")  # Log email
         # Find the MOST RECENT valid subscription
         active_sub = db.query(Subscription).filter(
             Subscription.user_email == email,
@@ -226,9 +310,11 @@ async def check_subscription(email: str, db: Session = Depends(get_db)):
         ).order_by(Subscription.expiry_date.desc()).first()
 
         if active_sub:
-            print(f"✅ [DEBUG] Active subscription found:")
-            print(f"   - Trial: {active_sub.is_trial}")
-            print(f"   - Expiry (UTC): {active_sub.expiry_date.isoformat()}Z")  # Log UTC time
+            logger.debug("Active subscription found", extra={
+                "route": "check_subscription",
+                "is_trial": active_sub.is_trial,
+                "expiry_utc": active_sub.expiry_date.isoformat() + "Z",
+            })
             return {
                 "has_access": True,
                 "start_utc": active_sub.created_at.isoformat() + "Z",  # Add creation timestamp
@@ -236,16 +322,16 @@ async def check_subscription(email: str, db: Session = Depends(get_db)):
                 "is_trial": active_sub.is_trial
             }
 
-        print("❌ [DEBUG] No active subscription found")
+        logger.debug("No active subscription found", extra={"route": "check_subscription"})
         return {"has_access": False, "reason": "No active subscription"}
     
     except Exception as e:
-        print(f"🔥 [DEBUG] Error in check_subscription: {str(e)}")  # Log errors
+        logger.exception("Error in check_subscription", extra={"route": "check_subscription"})
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/api/user-profile")
-async def get_user_profile(email: str, db: Session = Depends(get_db)):
+@router.get("/api/user-profile", response_model=UserProfile)
+async def get_user_profile(email: str, db: Session = Depends(get_read_db)):
     try:
         user = db.query(User).filter(User.email == email).first()
         if not user:
@@ -261,13 +347,67 @@ async def get_user_profile(email: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/api/me", response_model=Me)
+async def get_me(
+    request: Request,
+    email: str = None,
+    user_email: str = Cookie(None),
+    db: Session = Depends(get_read_db)
+):
+    """Profile and current entitlement in one round trip and one query"""
+    email = email or user_email
+    if not email:
+        raise HTTPException(status_code=401, detail="Not logged in")
+
+    now = datetime.utcnow()
+    row = db.query(User, Subscription).outerjoin(
+        Subscription,
+        and_(
+            Subscription.user_email == User.email,
+            Subscription.expiry_date > now
+        )
+    ).filter(User.email == email).order_by(Subscription.expiry_date.desc()).first()
+
+    if row is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    user, active_sub = row
+    if active_sub:
+        subscription = {
+            "has_access": True,
+            "start_utc": active_sub.created_at.isoformat() + "Z",
+            "expiry_utc": active_sub.expiry_date.isoformat() + "Z",
+            "is_trial": active_sub.is_trial
+        }
+        remaining = int((active_sub.expiry_date - now).total_seconds())
+        cache_control = f"private, max-age={max(0, min(remaining, ME_MAX_AGE_SECONDS))}, must-revalidate"
+    else:
+        subscription = {"has_access": False, "reason": "No active subscription"}
+        cache_control = "private, no-cache"
+
+    body = {
+        "profile": {
+            "name": user.fullname or "",
+            "email": user.email,
+            "phone": user.phone or ""
+        },
+        "subscription": subscription
+    }
+    payload = orjson.dumps(body)
+    etag = f'W/"{hashlib.sha1(payload).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Cookie"}
+
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(content=payload, media_type="application/json", headers=headers)
+
 
 # Add these at the top of your file
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 # Add these new endpoints
-@router.post("/api/update-profile")
+@router.post("/api/update-profile", response_model=StatusMessage)
 async def update_profile(
     request: Request,
     db: Session = Depends(get_db)
@@ -284,12 +424,21 @@ async def update_profile(
     if fullname is not None:
         user.fullname = fullname
     if phone is not None:
+        phone_e164 = normalize_phone(phone)
+        if phone_e164 is None:
+            raise HTTPException(status_code=400, detail="Invalid phone number")
         user.phone = phone
+        user.phone_e164 = phone_e164
 
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Phone already registered")
+    mark_write(email)
     return {"status": "success", "message": "Profile updated"}
 
-@router.post("/api/change-password")
+@router.post("/api/change-password", dependencies=[Depends(rate_limit("change-password"))])
 async def change_password(
     request: Request,
     db: Session = Depends(get_db)
@@ -310,5 +459,6 @@ async def change_password(
     # Update password
     user.hashed_password = pwd_context.hash(new_password)
     db.commit()
+    mark_write(email)
 
     return {"status": "success", "message": "Password updated successfully"}
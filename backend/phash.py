@@ -0,0 +1,107 @@
+"""Perceptual hashes and a BK-tree for near-duplicate image lookup.
+
+Both hashes are 64-bit integers; similar images differ in few bits.
+  dhash: sign of horizontal gradients on a 9x8 thumbnail (fast, crop-sensitive)
+  phash: sign of the low-frequency 8x8 DCT block against its median
+         (robust to re-encoding, scaling and small colour changes)
+
+Hashes are stored as 16-character hex strings; "" marks a file that could
+not be decoded as an image.
+"""
+import io
+from typing import Optional
+
+import numpy as np
+from PIL import Image, ImageOps
+
+
+def _gray(img: Image.Image, size) -> np.ndarray:
+    img.seek(0)  # first frame of animated GIFs
+    gray = ImageOps.exif_transpose(img).convert("L")
+    return np.asarray(gray.resize(size, Image.LANCZOS), dtype=np.float64)
+
+
+def _to_int(bits: np.ndarray) -> int:
+    return int("".join("1" if b else "0" for b in bits.ravel()), 2)
+
+
+def dhash(img: Image.Image) -> int:
+    pixels = _gray(img, (9, 8))
+    return _to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)
+    m = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n)) * np.sqrt(2 / n)
+    m[0] /= np.sqrt(2)
+    return m
+
+
+_DCT32 = _dct_matrix(32)
+
+
+def phash(img: Image.Image) -> int:
+    pixels = _gray(img, (32, 32))
+    low = (_DCT32 @ pixels @ _DCT32.T)[:8, :8].ravel()
+    return _to_int(low > np.median(low[1:]))  # DC term skews the median
+
+
+def hashes(data: bytes) -> Optional[tuple]:
+    """(dhash, phash) of encoded image bytes, or None if they aren't an image."""
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            return dhash(img), phash(img)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+
+def to_hex(value: int) -> str:
+    return f"{value:016x}"
+
+
+def from_hex(value: str) -> int:
+    return int(value, 16)
+
+
+def distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """Metric tree over Hamming distance: search visits only subtrees whose
+    edge distance could still hold a match (triangle inequality)."""
+
+    def __init__(self):
+        self._root = None  # [hash, [keys], {edge distance: child}]
+        self.size = 0
+
+    def add(self, value: int, key):
+        self.size += 1
+        if self._root is None:
+            self._root = [value, [key], {}]
+            return
+        node = self._root
+        while True:
+            d = distance(value, node[0])
+            if d == 0:
+                node[1].append(key)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [value, [key], {}]
+                return
+            node = child
+
+    def search(self, value: int, max_distance: int) -> list:
+        """[(distance, key)] for every entry within max_distance, closest first."""
+        found = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            d = distance(value, node[0])
+            if d <= max_distance:
+                found.extend((d, key) for key in node[1])
+            for edge, child in node[2].items():
+                if d - max_distance <= edge <= d + max_distance:
+                    stack.append(child)
+        return sorted(found, key=lambda item: item[0])
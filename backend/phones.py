@@ -0,0 +1,39 @@
+"""Phone number normalization to E.164.
+
+Users type numbers many ways ("0801 234 5678", "+234-801-234-5678",
+"2348012345678"). Lookups and uniqueness use the E.164 form stored in
+users.phone_e164; users.phone keeps what was typed, for display.
+"""
+import os
+import re
+from typing import Optional
+
+DEFAULT_COUNTRY_CODE = os.getenv("DEFAULT_PHONE_COUNTRY_CODE", "234")  # Nigeria
+NATIONAL_NUMBER_DIGITS = int(os.getenv("NATIONAL_PHONE_DIGITS", "10"))  # after the trunk 0
+
+_SEPARATORS = re.compile(r"[\s\-().]")
+
+
+def normalize_phone(raw: Optional[str]) -> Optional[str]:
+    """E.164 form of `raw` ("+2348012345678"), or None if it isn't a phone number."""
+    if not raw:
+        return None
+    number = _SEPARATORS.sub("", str(raw))
+    if number.startswith("+"):
+        digits = number[1:]
+    elif number.startswith("00"):
+        digits = number[2:]
+    elif number.startswith("0") and len(number) == NATIONAL_NUMBER_DIGITS + 1:
+        digits = DEFAULT_COUNTRY_CODE + number[1:]
+    elif number.startswith(DEFAULT_COUNTRY_CODE) and len(number) == len(DEFAULT_COUNTRY_CODE) + NATIONAL_NUMBER_DIGITS:
+        digits = number
+    elif len(number) == NATIONAL_NUMBER_DIGITS:
+        digits = DEFAULT_COUNTRY_CODE + number  # trunk 0 left off
+    else:
+        return None
+
+    if not digits.isdigit() or not 8 <= len(digits) <= 15 or digits.startswith("0"):
+        return None
+    if digits.startswith(DEFAULT_COUNTRY_CODE + "0"):
+        digits = DEFAULT_COUNTRY_CODE + digits[len(DEFAULT_COUNTRY_CODE) + 1:]  # "+234 0801..." typed with the trunk 0
+    return "+" + digits
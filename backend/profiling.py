@@ -0,0 +1,222 @@
+"""Opt-in per-request profiling.
+
+A request is profiled when an admin asks for it (the X-Profile header or a
+`profile=1` query flag, together with the admin password in
+X-Admin-Password or `admin_password`) or when it falls inside
+PROFILE_SAMPLE_RATE. A profiled request gets:
+
+- sampled call stacks, collected every PROFILE_INTERVAL_MS from the event
+  loop thread and from every worker thread that ran the request's SQL;
+- every SQL statement it executed, with timings and row counts.
+
+Finished profiles go into a ring buffer of the last PROFILE_BUFFER_SIZE and
+can be read back from /admin/profiles, including as collapsed stacks
+(`frame;frame;frame count`) for flamegraph.pl or speedscope.
+
+Stacks are sampled per thread, so on a busy worker the event loop samples
+can include other requests' frames; the SQL list is exact.
+"""
+import contextvars
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Optional
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from backend.logs import get_logger
+
+logger = get_logger("profiling")
+
+SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+INTERVAL_SECONDS = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "50"))
+MAX_SQL_STATEMENTS = 500
+MAX_STACK_DEPTH = 128
+
+_current: contextvars.ContextVar[Optional["Profile"]] = contextvars.ContextVar("profile", default=None)
+_ids = itertools.count(1)
+_buffer = deque(maxlen=BUFFER_SIZE)
+_active = set()
+_lock = threading.Lock()
+_sampler = None
+
+
+class Profile:
+    def __init__(self, method: str, path: str, trigger: str):
+        self.id = next(_ids)
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.started_at = datetime.utcnow()
+        self.started = time.perf_counter()
+        self.duration_ms = None
+        self.status_code = None
+        self.threads = {threading.get_ident()}
+        self.stacks = Counter()
+        self.samples = 0
+        self.sql = []
+        self.sql_ms = 0.0
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "trigger": self.trigger,
+            "status_code": self.status_code,
+            "started_at": self.started_at.isoformat() + "Z",
+            "duration_ms": self.duration_ms,
+            "samples": self.samples,
+            "sql_count": len(self.sql),
+            "sql_ms": round(self.sql_ms, 3),
+        }
+
+    def detail(self) -> dict:
+        top = self.stacks.most_common(20)
+        return {**self.summary(), "sql": self.sql, "top_stacks": [{"stack": s, "samples": n} for s, n in top]}
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+
+# ===== Stack sampling ===== #
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{code.co_qualname}"
+
+
+def _collapse(frame) -> str:
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+def _sample_loop():
+    global _sampler
+    me = threading.get_ident()
+    while True:
+        with _lock:
+            profiles = list(_active)
+            if not profiles:
+                _sampler = None
+                return
+        frames = sys._current_frames()
+        for profile in profiles:
+            for ident in list(profile.threads):
+                frame = frames.get(ident)
+                if frame is not None and ident != me:
+                    profile.stacks[_collapse(frame)] += 1
+                    profile.samples += 1
+        del frames
+        time.sleep(INTERVAL_SECONDS)
+
+
+def _activate(profile: Profile):
+    global _sampler
+    with _lock:
+        _active.add(profile)
+        if _sampler is None:
+            _sampler = threading.Thread(target=_sample_loop, name="profile-sampler", daemon=True)
+            _sampler.start()
+
+
+def _deactivate(profile: Profile):
+    with _lock:
+        _active.discard(profile)
+
+
+# ===== SQL timing ===== #
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    if profile is not None:
+        profile.threads.add(threading.get_ident())
+        conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    started = conn.info.get("profile_started")
+    if profile is None or not started:
+        return
+    elapsed = (time.perf_counter() - started.pop()) * 1000
+    profile.sql_ms += elapsed
+    if len(profile.sql) < MAX_SQL_STATEMENTS:
+        # Parameters are left out on purpose: they carry emails, hashes and OTPs.
+        profile.sql.append({
+            "statement": " ".join(statement.split())[:1000],
+            "ms": round(elapsed, 3),
+            "rows": cursor.rowcount,
+            "executemany": executemany,
+            "offset_ms": round((time.perf_counter() - profile.started) * 1000 - elapsed, 3),
+        })
+
+
+# ===== Request hook ===== #
+def _trigger(request: Request) -> Optional[str]:
+    from backend.routes.admin import ADMIN_SECRET
+
+    asked = request.headers.get("x-profile") or request.query_params.get("profile")
+    if asked and asked not in ("0", "false"):
+        password = request.headers.get("x-admin-password") or request.query_params.get("admin_password")
+        if password == ADMIN_SECRET:
+            return "admin"
+    if SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+async def profiling_middleware(request: Request, call_next):
+    """Profile the request if triggered; register it outermost to see the whole request."""
+    trigger = _trigger(request)
+    if trigger is None:
+        return await call_next(request)
+
+    profile = Profile(request.method, request.url.path, trigger)
+    token = _current.set(profile)
+    _activate(profile)
+    try:
+        response = await call_next(request)
+        profile.status_code = response.status_code
+        response.headers["X-Profile-Id"] = str(profile.id)
+        return response
+    finally:
+        _deactivate(profile)
+        _current.reset(token)
+        profile.duration_ms = round((time.perf_counter() - profile.started) * 1000, 3)
+        _buffer.append(profile)
+        logger.info("Request profiled", extra={"route": "profiling", **profile.summary()})
+
+
+# ===== Retrieval ===== #
+def profiles() -> list:
+    """Summaries of the buffered profiles, newest first."""
+    return [p.summary() for p in reversed(_buffer)]
+
+
+def get(profile_id: int) -> Optional[Profile]:
+    for profile in _buffer:
+        if profile.id == profile_id:
+            return profile
+    return None
+
+
+def collapsed(path: str = None) -> str:
+    """Collapsed stacks merged across buffered profiles (optionally for one path)."""
+    merged = Counter()
+    for profile in list(_buffer):
+        if path is None or profile.path == path:
+            merged.update(profile.stacks)
+    return "".join(f"{stack} {count}\n" for stack, count in merged.items())
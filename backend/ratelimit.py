@@ -0,0 +1,208 @@
+import math
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from fastapi import HTTPException, Request
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from backend.logs import get_logger
+from backend.phones import normalize_phone
+
+logger = get_logger("ratelimit")
+
+
+class Limit(NamedTuple):
+    scope: str          # "ip", "phone" or "email"
+    capacity: int       # burst size
+    per_seconds: float  # time to refill a full bucket
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.per_seconds
+
+
+# Per-route policies. Every limit that applies must have a token left.
+POLICIES = {
+    "login": [Limit("ip", 30, 300), Limit("phone", 10, 900)],
+    "send-otp": [Limit("ip", 10, 3600), Limit("email", 3, 600), Limit("phone", 3, 600)],
+    "resend-otp": [Limit("ip", 10, 3600), Limit("email", 3, 600), Limit("phone", 3, 600)],
+    "change-password": [Limit("ip", 20, 3600), Limit("email", 5, 900)],
+}
+
+
+class MemoryBackend:
+    """Per-process buckets in an LRU map with a hard key cap.
+
+    A bucket that has been idle long enough to refill is indistinguishable
+    from a fresh one, so it is dropped on the next sweep.
+    """
+
+    blocking = False
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> [tokens, updated_at, full_at]
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: int, rate: float, cost: float = 1.0):
+        """Return (allowed, retry_after_seconds)."""
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(now)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = float(capacity)
+            else:
+                tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                self._buckets.move_to_end(key)
+
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = [tokens, now, now + (capacity - tokens) / rate]
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+    def _sweep(self, now: float, budget: int = 8):
+        # Oldest entries first; stop at the first bucket still refilling.
+        for _ in range(budget):
+            if not self._buckets:
+                return
+            key, bucket = next(iter(self._buckets.items()))
+            if bucket[2] > now:
+                return
+            del self._buckets[key]
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+_REFILLED = (
+    "CASE WHEN rate_limit_buckets.tokens + (:now - rate_limit_buckets.updated_at) * :rate > :capacity"
+    " THEN :capacity"
+    " ELSE rate_limit_buckets.tokens + (:now - rate_limit_buckets.updated_at) * :rate END"
+)
+
+_TAKE_SQL = text(f"""
+    INSERT INTO rate_limit_buckets (key, tokens, updated_at, allowed)
+    VALUES (:key, :capacity - :cost, :now, TRUE)
+    ON CONFLICT (key) DO UPDATE SET
+        tokens = CASE WHEN {_REFILLED} >= :cost THEN {_REFILLED} - :cost ELSE {_REFILLED} END,
+        allowed = ({_REFILLED} >= :cost),
+        updated_at = :now
+    RETURNING tokens, allowed
+""")
+
+_PURGE_SQL = text("DELETE FROM rate_limit_buckets WHERE updated_at < :cutoff")
+
+
+class SqlBackend:
+    """Buckets in the `rate_limit_buckets` table so limits hold across workers.
+
+    Each take is a single atomic upsert. If the database is unavailable the
+    call falls back to a per-process bucket rather than failing the request.
+    """
+
+    blocking = True
+
+    def __init__(self, purge_after_seconds: float = 86400, purge_probability: float = 0.01):
+        self.purge_after_seconds = purge_after_seconds
+        self.purge_probability = purge_probability
+        self._fallback = MemoryBackend()
+
+    def take(self, key: str, capacity: int, rate: float, cost: float = 1.0):
+        from backend.db import get_engine
+
+        now = time.time()
+        params = {"key": key, "capacity": float(capacity), "rate": rate, "cost": float(cost), "now": now}
+        try:
+            with get_engine().begin() as conn:
+                tokens, allowed = conn.execute(_TAKE_SQL, params).one()
+                if random.random() < self.purge_probability:
+                    conn.execute(_PURGE_SQL, {"cutoff": now - self.purge_after_seconds})
+        except Exception as e:
+            logger.warning("Shared rate-limit store unavailable, using local buckets",
+                           extra={"error": str(e)})
+            return self._fallback.take(key, capacity, rate, cost)
+
+        return bool(allowed), 0.0 if allowed else (cost - tokens) / rate
+
+
+def _make_backend():
+    kind = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    if kind == "sql":
+        return SqlBackend()
+    return MemoryBackend(max_keys=int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000")))
+
+
+backend = _make_backend()
+
+
+# Reverse proxies in front of the app that append to X-Forwarded-For. Entries
+# left of the ones they added come from the client and can be anything.
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "1"))
+
+
+def client_ip(request: Request) -> str:
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded and TRUSTED_PROXY_HOPS > 0:
+        hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+        if hops:
+            # Added by the outermost trusted proxy: the address it saw connecting
+            return hops[-min(TRUSTED_PROXY_HOPS, len(hops))]
+    return request.client.host if request.client else "unknown"
+
+
+async def _identity(request: Request, scope: str) -> Optional[str]:
+    if scope == "ip":
+        return client_ip(request)
+    try:
+        body = await request.json()
+    except Exception:
+        return None
+    value = body.get(scope) if isinstance(body, dict) else None
+    if not value:
+        return None
+    if scope == "phone":
+        # One bucket per number however it is typed; unparseable input keys on itself
+        return normalize_phone(str(value)) or str(value).strip().lower() or None
+    return str(value).strip().lower() or None
+
+
+def rate_limit(route: str):
+    """Dependency enforcing POLICIES[route]; use in the route decorator.
+
+    Decorator-level dependencies run before the handler's own parameters,
+    so a rejected request never reaches hashing, SMTP or the database.
+    """
+    policy = POLICIES[route]
+    enabled = os.getenv("RATE_LIMIT_ENABLED", "1") != "0"
+
+    async def dependency(request: Request):
+        if not enabled:
+            return
+        for limit in policy:
+            identity = await _identity(request, limit.scope)
+            if identity is None:
+                continue
+            key = f"{route}:{limit.scope}:{identity}"
+            if backend.blocking:
+                allowed, retry_after = await run_in_threadpool(backend.take, key, limit.capacity, limit.rate)
+            else:
+                allowed, retry_after = backend.take(key, limit.capacity, limit.rate)
+            if not allowed:
+                logger.info("Rate limit exceeded", extra={"route": route, "scope": limit.scope})
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too many requests, please try again later",
+                    headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+                )
+
+    return dependency
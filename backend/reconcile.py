@@ -0,0 +1,158 @@
+"""Settle Paystack transactions whose callback never reached us.
+
+Instead of one verify call per reference, the job pages through Paystack's
+transaction list for the window that covers every pending reference and
+settles them all in a single database transaction.
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+import requests
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from backend import entitlements, resilience
+from backend.db import SessionLocal, mark_write
+from backend.logs import get_logger
+from backend.models import PendingTransaction, Subscription, User
+from backend.paystack import PAYSTACK_API_BASE, PAYSTACK_TIMEOUT, get_paystack_auth_header, grant_paid_subscription
+
+logger = get_logger("reconcile")
+
+INTERVAL_SECONDS = int(os.getenv("RECONCILE_INTERVAL_SECONDS", "900"))  # 0 disables the job
+WINDOW_HOURS = int(os.getenv("RECONCILE_WINDOW_HOURS", "48"))
+PER_PAGE = 100
+# Paystack reports unpaid checkouts as "abandoned" but they can still be paid,
+# so those stay pending until they age out of the window.
+FINAL_STATUSES = {"success", "failed", "reversed"}
+_ADVISORY_LOCK_ID = 0x41525443  # "ARTC": one reconciler at a time across workers
+
+
+def list_transactions(start: datetime, end: datetime, http=requests):
+    """Yield every Paystack transaction created between start and end."""
+    page = 1
+    while True:
+        response = resilience.paystack.call(
+            http.get,
+            f"{PAYSTACK_API_BASE}/transaction",
+            params={
+                "from": start.isoformat() + "Z",
+                "to": end.isoformat() + "Z",
+                "perPage": PER_PAGE,
+                "page": page,
+            },
+            headers=get_paystack_auth_header(),
+            timeout=PAYSTACK_TIMEOUT,
+        )
+        response.raise_for_status()
+        body = response.json()
+        yield from body.get("data") or []
+
+        meta = body.get("meta") or {}
+        if page >= int(meta.get("pageCount") or page) or not body.get("data"):
+            return
+        page += 1
+
+
+def _expire_stale(db: Session, cutoff: datetime, now: datetime, counts: dict):
+    expired = db.query(PendingTransaction).filter(
+        PendingTransaction.status == "pending",
+        PendingTransaction.created_at < cutoff
+    ).update({"status": "expired", "settled_at": now}, synchronize_session=False)
+    if expired:
+        counts["expired"] = expired
+
+
+def reconcile(db: Session, window_hours: int = WINDOW_HOURS, now: datetime = None) -> dict:
+    """Settle pending references created in the last window_hours.
+
+    Returns counts per resulting status. Pending rows older than the window
+    are marked expired.
+    """
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(hours=window_hours)
+    counts = {}
+
+    if db.get_bind().dialect.name == "postgresql":
+        if not db.execute(text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": _ADVISORY_LOCK_ID}).scalar():
+            logger.info("Reconciliation already running elsewhere")
+            return counts
+
+    pending = db.query(PendingTransaction).filter(
+        PendingTransaction.status == "pending",
+        PendingTransaction.created_at >= cutoff
+    ).all()
+    if not pending:
+        _expire_stale(db, cutoff, now, counts)
+        db.commit()
+        return counts
+
+    by_reference = {p.reference: p for p in pending}
+    start = min(p.created_at for p in pending) - timedelta(minutes=5)
+    remote = {}
+    for tx in list_transactions(start, now):
+        if tx.get("reference") in by_reference:
+            remote[tx["reference"]] = tx
+
+    users = {
+        u.email: u for u in
+        db.query(User).filter(User.email.in_({p.user_email for p in pending})).all()
+    }
+    already_granted = {
+        ref for (ref,) in db.query(Subscription.payment_reference).filter(
+            Subscription.payment_reference.in_(list(by_reference))
+        )
+    }
+
+    settled_emails = set()
+    for reference, pending_tx in by_reference.items():
+        tx = remote.get(reference)
+        status = tx.get("status") if tx else None
+        if status not in FINAL_STATUSES:
+            continue  # still ongoing on Paystack's side; try again next run
+
+        if status == "success" and reference not in already_granted:
+            user = users.get(pending_tx.user_email)
+            if user is None:
+                logger.warning("Paid reference has no user", extra={"reference": reference})
+                continue
+            grant_paid_subscription(db, user, reference, amount_naira=(tx.get("amount") or 0) / 100)
+            settled_emails.add(user.email)
+
+        pending_tx.status = status
+        pending_tx.settled_at = now
+        counts[status] = counts.get(status, 0) + 1
+
+    _expire_stale(db, cutoff, now, counts)
+    db.commit()
+    for email in settled_emails:
+        mark_write(email)
+        entitlements.invalidate(email)
+
+    logger.info("Reconciliation finished", extra={"counts": counts, "pending": len(pending)})
+    return counts
+
+
+def reconcile_once(window_hours: int = WINDOW_HOURS) -> dict:
+    db = SessionLocal()
+    try:
+        return reconcile(db, window_hours)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def run_forever():
+    """Background loop started from the app lifespan."""
+    while True:
+        await asyncio.sleep(INTERVAL_SECONDS)
+        try:
+            await run_in_threadpool(reconcile_once)
+        except resilience.UpstreamUnavailable as e:
+            logger.warning("Reconciliation skipped", extra={"reason": str(e)})
+        except Exception:
+            logger.exception("Reconciliation run failed")
@@ -0,0 +1,218 @@
+"""Circuit breakers and bulkheads for calls to external services.
+
+Each upstream (Paystack, SMTP) gets one Upstream per worker process:
+
+- a bulkhead caps calls in flight; extra calls are rejected at once rather
+  than queueing on the shared threadpool;
+- a circuit breaker opens after FAILURES consecutive failures and then
+  rejects calls for RESET_SECONDS; after that it lets HALF_OPEN_PROBES
+  trial calls through (half-open) and closes again once they succeed, or
+  reopens on the first failure.
+
+Rejections raise UpstreamUnavailable, so callers can answer 503 quickly.
+Settings come from the environment per upstream, e.g. PAYSTACK_MAX_CONCURRENT,
+PAYSTACK_BREAKER_FAILURES, PAYSTACK_BREAKER_RESET_SECONDS,
+PAYSTACK_HALF_OPEN_PROBES. snapshot() feeds /admin/upstreams.
+"""
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from backend.logs import get_logger
+
+logger = get_logger("resilience")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class UpstreamUnavailable(Exception):
+    """The call was not attempted; retry after `retry_after` seconds."""
+
+    def __init__(self, upstream: str, reason: str, retry_after: float):
+        super().__init__(f"{upstream} unavailable: {reason}")
+        self.upstream = upstream
+        self.reason = reason
+        self.retry_after = max(1, int(retry_after + 0.999))
+
+
+class Upstream:
+    def __init__(self, name: str, max_concurrent: int = 8, failure_threshold: int = 5,
+                 reset_seconds: float = 30.0, half_open_probes: int = 1,
+                 is_failure: Optional[Callable] = None):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.half_open_probes = half_open_probes
+        self.is_failure = is_failure or (lambda result: False)
+
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.in_flight = 0
+        self._probes = 0
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self.last_error = None
+        self.counters = {
+            "calls": 0, "successes": 0, "failures": 0,
+            "rejected_open": 0, "rejected_full": 0, "opened": 0,
+        }
+        self._latency_total = 0.0
+
+    @classmethod
+    def from_env(cls, name: str, **defaults) -> "Upstream":
+        prefix = name.upper()
+
+        def setting(key, cast, default):
+            return cast(os.getenv(f"{prefix}_{key}", default))
+
+        return cls(
+            name,
+            max_concurrent=setting("MAX_CONCURRENT", int, defaults.pop("max_concurrent", 8)),
+            failure_threshold=setting("BREAKER_FAILURES", int, defaults.pop("failure_threshold", 5)),
+            reset_seconds=setting("BREAKER_RESET_SECONDS", float, defaults.pop("reset_seconds", 30)),
+            half_open_probes=setting("HALF_OPEN_PROBES", int, defaults.pop("half_open_probes", 1)),
+            **defaults,
+        )
+
+    # ===== State machine ===== #
+    def _transition(self, state: str):
+        if state != self.state:
+            logger.warning("Circuit breaker state change", extra={
+                "upstream": self.name, "from": self.state, "to": state, "error": self.last_error,
+            })
+            self.state = state
+
+    def _admit(self):
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN:
+                remaining = self._opened_at + self.reset_seconds - now
+                if remaining > 0:
+                    self.counters["rejected_open"] += 1
+                    raise UpstreamUnavailable(self.name, "circuit open", remaining)
+                self._transition(HALF_OPEN)
+                self._probes = 0
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    self.counters["rejected_open"] += 1
+                    raise UpstreamUnavailable(self.name, "circuit half-open, probe in progress", 1)
+                self._probes += 1
+            if self.in_flight >= self.max_concurrent:
+                if self.state == HALF_OPEN:
+                    self._probes -= 1
+                self.counters["rejected_full"] += 1
+                raise UpstreamUnavailable(self.name, "too many calls in flight", 1)
+            self.in_flight += 1
+            self.counters["calls"] += 1
+
+    def _record(self, ok: bool, elapsed: float, error: str = None):
+        with self._lock:
+            self.in_flight -= 1
+            self._latency_total += elapsed
+            if ok:
+                self.counters["successes"] += 1
+                self._consecutive_failures = 0
+                if self.state == HALF_OPEN:
+                    self._probes -= 1
+                    if self._probes <= 0:
+                        self._transition(CLOSED)
+                return
+            self.counters["failures"] += 1
+            self.last_error = error
+            self._consecutive_failures += 1
+            if self.state == HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.counters["opened"] += 1
+                self._opened_at = time.monotonic()
+                self._probes = 0
+                self._transition(OPEN)
+
+    def _finish(self, started: float, result=None, exc: BaseException = None):
+        elapsed = time.monotonic() - started
+        if exc is not None:
+            self._record(False, elapsed, f"{type(exc).__name__}: {exc}")
+        elif self.is_failure(result):
+            self._record(False, elapsed, f"bad response: {getattr(result, 'status_code', result)!r}")
+        else:
+            self._record(True, elapsed)
+
+    # ===== Calling through ===== #
+    def call(self, fn, *args, **kwargs):
+        """Run fn in the current thread under the breaker and bulkhead."""
+        self._admit()
+        started = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._finish(started, exc=e)
+            raise
+        self._finish(started, result)
+        return result
+
+    async def acall(self, fn, *args, **kwargs):
+        """Like call(), but runs fn on the threadpool; rejected calls never take a thread."""
+        self._admit()
+        started = time.monotonic()
+        try:
+            result = await run_in_threadpool(fn, *args, **kwargs)
+        except BaseException as e:
+            self._finish(started, exc=e)
+            raise
+        self._finish(started, result)
+        return result
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            completed = self.counters["successes"] + self.counters["failures"]
+            retry_in = max(0.0, self._opened_at + self.reset_seconds - time.monotonic()) if self.state == OPEN else 0.0
+            return {
+                "state": self.state,
+                "in_flight": self.in_flight,
+                "max_concurrent": self.max_concurrent,
+                "consecutive_failures": self._consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "retry_in_seconds": round(retry_in, 1),
+                "mean_latency_ms": round(self._latency_total / completed * 1000, 1) if completed else None,
+                "last_error": self.last_error,
+                **self.counters,
+            }
+
+
+def _http_5xx(response) -> bool:
+    return getattr(response, "status_code", 200) >= 500
+
+
+paystack = Upstream.from_env("paystack", max_concurrent=16, is_failure=_http_5xx)
+smtp = Upstream.from_env("smtp", max_concurrent=4)
+
+UPSTREAMS = {u.name: u for u in (paystack, smtp)}
+
+
+def snapshot() -> dict:
+    return {name: upstream.snapshot() for name, upstream in UPSTREAMS.items()}
+
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+def prometheus() -> str:
+    """snapshot() in the Prometheus text exposition format."""
+    lines = [
+        "# TYPE upstream_breaker_state gauge",
+        "# HELP upstream_breaker_state 0 closed, 1 half-open, 2 open",
+    ]
+    snaps = snapshot()
+    for name, snap in snaps.items():
+        lines.append(f'upstream_breaker_state{{upstream="{name}"}} {_STATE_VALUES[snap["state"]]}')
+    lines.append("# TYPE upstream_in_flight gauge")
+    for name, snap in snaps.items():
+        lines.append(f'upstream_in_flight{{upstream="{name}"}} {snap["in_flight"]}')
+    for counter in ("calls", "successes", "failures", "rejected_open", "rejected_full", "opened"):
+        lines.append(f"# TYPE upstream_{counter}_total counter")
+        for name, snap in snaps.items():
+            lines.append(f'upstream_{counter}_total{{upstream="{name}"}} {snap[counter]}')
+    return "\n".join(lines) + "\n"
@@ -1,8 +1,11 @@
 import os
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
-from backend.db import SessionLocal
+from backend.db import get_read_db
 from backend.models import User
+from backend.schemas import AdminUser
+from backend import blob_cache, jobs, profiling, resilience
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -13,28 +16,82 @@ ADMIN_SECRET = os.getenv("ADMIN_PASSWORD", "secret123")
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
-# Get DB dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # Admin user list route
-@router.get("/users")
-def get_users(admin_password: str, db: Session = Depends(get_db)):
+@router.get("/users", response_model=list[AdminUser])
+def get_users(
+    admin_password: str,
+    limit: int = Query(None, ge=1, le=10000),
+    after_id: int = Query(0, ge=0),
+    db: Session = Depends(get_read_db)
+):
+    """Users by id; page with ?limit=N&after_id=<last id of the previous page>"""
+    if admin_password != ADMIN_SECRET:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+
+    # Plain rows rather than ORM objects: nothing here needs identity tracking
+    query = db.query(
+        User.id, User.fullname, User.phone, User.email, User.hashed_password
+    ).filter(User.id > after_id).order_by(User.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return [row._asdict() for row in query]
+
+
+def _check_admin(admin_password: str):
     if admin_password != ADMIN_SECRET:
         raise HTTPException(status_code=403, detail="Unauthorized")
 
-    users = db.query(User).all()
-    return [
-        {
-            "id": user.id,
-            "fullname": user.fullname,
-            "phone": user.phone,
-            "email": user.email,
-            "hashed_password": user.hashed_password
-        }
-        for user in users
-    ]
+
+# Captured request profiles (see backend/profiling.py)
+@router.get("/profiles")
+def list_profiles(admin_password: str):
+    _check_admin(admin_password)
+    return profiling.profiles()
+
+
+@router.get("/profiles/collapsed", response_class=PlainTextResponse)
+def merged_profile_stacks(admin_password: str, path: str = None):
+    """Collapsed stacks across all buffered profiles, for flamegraph.pl or speedscope"""
+    _check_admin(admin_password)
+    return profiling.collapsed(path)
+
+
+@router.get("/profiles/{profile_id}")
+def get_profile(profile_id: int, admin_password: str):
+    _check_admin(admin_password)
+    profile = profiling.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found or already evicted")
+    return profile.detail()
+
+
+@router.get("/profiles/{profile_id}/collapsed", response_class=PlainTextResponse)
+def get_profile_stacks(profile_id: int, admin_password: str):
+    _check_admin(admin_password)
+    profile = profiling.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found or already evicted")
+    return profile.collapsed()
+
+
+@router.get("/jobs")
+def job_counts(admin_password: str):
+    """Background job counts by status; `dead` jobs need a look"""
+    _check_admin(admin_password)
+    return jobs.counts()
+
+
+@router.get("/upstreams")
+def upstream_breakers(admin_password: str, format: str = "json"):
+    """Circuit breaker and bulkhead state per external service; format=prometheus for scraping"""
+    _check_admin(admin_password)
+    if format == "prometheus":
+        return PlainTextResponse(resilience.prometheus(), media_type="text/plain; version=0.0.4")
+    return resilience.snapshot()
+
+
+@router.get("/blob-cache")
+def blob_cache_stats(admin_password: str):
+    """Hit rate and size of this worker's static blob cache"""
+    _check_admin(admin_password)
+    return blob_cache.cache.stats()
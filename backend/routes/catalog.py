@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from backend import catalog, template_index
+from backend.db import get_db
+
+router = APIRouter(prefix="/api", tags=["Catalog"])
+
+
+@router.get("/catalog")
+async def catalog_changes(since: int = Query(0, ge=0), db: Session = Depends(get_db)):
+    """Templates and tutorials added, changed or removed since catalog version `since`"""
+    body = await run_in_threadpool(catalog.changes, db, since)
+    return JSONResponse(body, headers={"Cache-Control": "no-cache"})
+
+
+@router.get("/templates/similar")
+async def similar_templates(
+    name: str,
+    max_distance: int = Query(template_index.SIMILAR_DISTANCE, ge=0, le=32),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """Templates that look like `name`, by perceptual-hash distance (0 = identical)"""
+    path = catalog.TEMPLATES_PREFIX + name
+    matches = await run_in_threadpool(template_index.similar, db, path, max_distance, limit)
+    if matches is None:
+        raise HTTPException(status_code=404, detail="Unknown template")
+    return {
+        "name": name,
+        "matches": [
+            {"name": p[len(catalog.TEMPLATES_PREFIX):], "url": f"{catalog.URL_PREFIX}/{p}", "distance": d}
+            for d, p in matches
+        ],
+    }
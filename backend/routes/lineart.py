@@ -0,0 +1,60 @@
+import json
+import numpy as np
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from PIL import UnidentifiedImageError
+from starlette.concurrency import run_in_threadpool
+from backend import lineart
+from backend.logs import get_logger
+
+router = APIRouter(prefix="/api", tags=["Line art"])
+logger = get_logger("lineart")
+
+MAX_UPLOAD_BYTES = 15 * 1024 * 1024
+
+
+@router.post("/lineart")
+async def create_lineart(
+    file: UploadFile = File(...),
+    corners: str = Form(None),  # JSON [[x, y], ...] as 0..1 fractions: TL, TR, BR, BL
+    mode: str = Form("threshold"),  # "threshold" or "edges"
+    offset: float = Form(12.0)
+):
+    """Convert a photographed plan into a transparent line-art PNG"""
+    # Never pull more than the limit into memory, whatever size the part claims
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Image too large")
+    data = await file.read(MAX_UPLOAD_BYTES + 1)
+    if not data:
+        raise HTTPException(status_code=400, detail="Empty upload")
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Image too large")
+    if mode not in ("threshold", "edges"):
+        raise HTTPException(status_code=400, detail="mode must be 'threshold' or 'edges'")
+
+    points = None
+    if corners:
+        try:
+            points = [[float(x), float(y)] for x, y in json.loads(corners)]
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="corners must be four [x, y] pairs")
+        if len(points) != 4 or not all(0 <= v <= 1 for p in points for v in p):
+            raise HTTPException(status_code=400, detail="corners must be four [x, y] pairs between 0 and 1")
+        if not lineart.is_convex_quad(points):
+            raise HTTPException(status_code=400, detail="corners must form a quadrilateral (no repeated or collinear corners)")
+
+    try:
+        result = await run_in_threadpool(lineart.extract_cached, data, points, mode, offset)
+    except (UnidentifiedImageError, OSError):
+        raise HTTPException(status_code=400, detail="Unsupported image")
+    except np.linalg.LinAlgError:
+        # Near-degenerate corners that slipped past is_convex_quad
+        raise HTTPException(status_code=400, detail="corners must form a quadrilateral (no repeated or collinear corners)")
+    except Exception:
+        logger.exception("Line-art extraction failed", extra={"route": "lineart"})
+        raise HTTPException(status_code=500, detail="Could not process image")
+
+    logger.info("Line art ready", extra={
+        "route": "lineart", "key": result["key"], "cached": result["cached"],
+        "bytes": result["bytes"], "source_bytes": result["source_bytes"],
+    })
+    return result
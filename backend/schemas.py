@@ -0,0 +1,65 @@
+"""Response models for the JSON API.
+
+Routes declare these with response_model so FastAPI validates and
+serializes the output with pydantic-core, and the app's ORJSONResponse
+writes the bytes. Optional fields that are None are left out of the
+response (response_model_exclude_none), which keeps each payload's shape
+as it was when these routes returned plain dicts.
+"""
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict
+
+
+class StatusMessage(BaseModel):
+    status: str
+    message: str
+
+
+class SubscriptionStatus(BaseModel):
+    has_access: bool
+    start_utc: Optional[str] = None
+    expiry_utc: Optional[str] = None
+    is_trial: Optional[bool] = None
+    reason: Optional[str] = None
+
+
+class AccessStatus(BaseModel):
+    has_access: bool
+    expiry: Optional[str] = None
+    reason: Optional[str] = None
+
+
+class UserProfile(BaseModel):
+    name: str
+    email: str
+    phone: str
+
+
+class Me(BaseModel):
+    profile: UserProfile
+    subscription: SubscriptionStatus
+
+
+class PasswordRules(BaseModel):
+    length: bool
+    uppercase: bool
+    lowercase: bool
+    number: bool
+    symbol: bool
+    not_common: bool
+
+
+class PasswordCheck(BaseModel):
+    valid: bool
+    rules: PasswordRules
+
+
+class AdminUser(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    fullname: Optional[str]
+    phone: Optional[str]
+    email: Optional[str]
+    hashed_password: str
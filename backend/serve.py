@@ -0,0 +1,77 @@
+"""Production entrypoint: python -m backend.serve
+
+Runs gunicorn with uvicorn workers. The app is imported once in the master
+(preload) and then forked, so workers share the imported code pages and
+start fast. Each worker still runs the FastAPI lifespan on its own: it
+warms up the database and joins the cache invalidation bus.
+
+Environment:
+  PORT              - listen port (default 8000)
+  WEB_CONCURRENCY   - worker count (default: CPUs available to this container)
+  WORKER_TIMEOUT    - seconds before a stuck worker is restarted (default 60)
+
+With more than one worker RATE_LIMIT_BACKEND defaults to "sql", so the
+limits hold across workers instead of being multiplied by their number.
+Pending signups are kept in the database for the same reason.
+"""
+import math
+import os
+
+from gunicorn.app.base import BaseApplication
+
+
+def available_cpus() -> int:
+    """CPUs this process may use, honouring affinity and cgroup v2 quotas."""
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        count = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            count = min(count, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return count
+
+
+def worker_count() -> int:
+    configured = os.getenv("WEB_CONCURRENCY")
+    return max(1, int(configured)) if configured else available_cpus()
+
+
+class Application(BaseApplication):
+    def __init__(self, app, options: dict):
+        self.application = app
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return self.application
+
+
+def main():
+    workers = worker_count()
+    if workers > 1:
+        os.environ.setdefault("RATE_LIMIT_BACKEND", "sql")  # read when the app is imported
+    from backend.main import app
+
+    options = {
+        "bind": f"0.0.0.0:{os.getenv('PORT', '8000')}",
+        "workers": workers,
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": True,
+        "timeout": int(os.getenv("WORKER_TIMEOUT", "60")),
+        "graceful_timeout": 30,
+        "keepalive": 5,
+    }
+    Application(app, options).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import asyncio
+
+
+class Group:
+    """Collapse concurrent calls with the same key into one in-flight call.
+
+    The first caller for a key runs the coroutine; callers arriving while it
+    is running await the same result (or exception). Nothing is cached once
+    the call finishes. Scoped to the current process and event loop.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, fn, *args, **kwargs):
+        future = self._calls.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+    def in_flight(self, key) -> bool:
+        return key in self._calls
@@ -0,0 +1,73 @@
+"""In-memory BK-tree over template perceptual hashes.
+
+Built per worker from catalog_items and rebuilt after any catalog scan
+that changed something (announced on the cache bus).
+
+Two templates are duplicates when both their pHash and dHash are within
+DUPLICATE_*_DISTANCE bits; "similar" uses the looser pHash distance alone.
+"""
+import os
+import threading
+
+from sqlalchemy.orm import Session
+
+from backend import cache_bus, catalog, phash
+from backend.models import CatalogItem
+
+DUPLICATE_PHASH_DISTANCE = int(os.getenv("TEMPLATE_DUPLICATE_PHASH_DISTANCE", "6"))
+DUPLICATE_DHASH_DISTANCE = int(os.getenv("TEMPLATE_DUPLICATE_DHASH_DISTANCE", "6"))
+SIMILAR_DISTANCE = int(os.getenv("TEMPLATE_SIMILAR_DISTANCE", "12"))
+
+_lock = threading.Lock()
+_index = None  # (BKTree over phash -> path, {path: (dhash, phash)})
+
+
+def _build(db: Session):
+    rows = db.query(CatalogItem.path, CatalogItem.dhash, CatalogItem.phash).filter(
+        CatalogItem.path.startswith(catalog.TEMPLATES_PREFIX),
+        CatalogItem.deleted.is_(False),
+        CatalogItem.phash.isnot(None),
+        CatalogItem.phash != "",
+    ).all()
+    tree, hashes = phash.BKTree(), {}
+    for path, dh, ph in rows:
+        hashes[path] = (phash.from_hex(dh), phash.from_hex(ph))
+        tree.add(hashes[path][1], path)
+    return tree, hashes
+
+
+def _get(db: Session):
+    global _index
+    with _lock:
+        index = _index
+    if index is None:
+        index = _build(db)
+        with _lock:
+            _index = index
+    return index
+
+
+@cache_bus.subscribe(catalog.CHANNEL)
+def _invalidate(_payload: str):
+    global _index
+    with _lock:
+        _index = None
+
+
+def find_duplicate(db: Session, hashes: tuple, exclude: str = None):
+    """Path of an existing template that duplicates (dhash, phash), or None."""
+    tree, known = _get(db)
+    dh, ph = hashes
+    for _, path in tree.search(ph, DUPLICATE_PHASH_DISTANCE):
+        if path != exclude and phash.distance(known[path][0], dh) <= DUPLICATE_DHASH_DISTANCE:
+            return path
+    return None
+
+
+def similar(db: Session, path: str, max_distance: int = SIMILAR_DISTANCE, limit: int = 20):
+    """[(distance, path)] of templates resembling `path`, closest first; None if unknown."""
+    tree, known = _get(db)
+    if path not in known:
+        return None
+    matches = [(d, p) for d, p in tree.search(known[path][1], max_distance) if p != path]
+    return matches[:limit]
@@ -1,28 +1,108 @@
-from fastapi import APIRouter, Request, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, File
 from fastapi.responses import RedirectResponse, HTMLResponse
 from fastapi.templating import Jinja2Templates
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from urllib.parse import quote
+from backend import catalog, phash, template_index
+from backend.db import get_db
+from backend.logs import get_logger
+from backend.routes.admin import ADMIN_SECRET
 import os
 
 router = APIRouter()
+logger = get_logger("templates")
 
 # Use absolute path for Render compatibility
 current_dir = os.path.dirname(os.path.abspath(__file__))
-templates = Jinja2Templates(directory=os.path.join(current_dir, "../../templates"))
-UPLOAD_DIR = os.path.join(current_dir, "../../static/templates")
+templates = Jinja2Templates(directory=os.path.join(current_dir, "../templates"))
+UPLOAD_DIR = str(catalog.STATIC_DIR / "templates")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-@router.get("/upload")  # This will become /templates/upload
-async def upload_ui(request: Request):
+# What to do with an upload that duplicates an existing template:
+#   reject - don't store it
+#   alias  - store a symlink to the existing file under the new name
+#   allow  - store it anyway
+DUPLICATES = os.getenv("TEMPLATE_DUPLICATES", "reject").lower()
+
+# Everything written here is served from the app origin, so only plain images get in
+IMAGE_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png", ".webp": "image/webp"}
+
+
+def _check_admin(admin_password: str):
+    if admin_password != ADMIN_SECRET:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+
+
+def _is_image_upload(name: str, content_type: str) -> bool:
+    expected = IMAGE_TYPES.get(os.path.splitext(name)[1].lower())
+    return not name.startswith(".") and expected is not None and content_type == expected
+
+
+@router.get("/upload", dependencies=[Depends(_check_admin)])  # This will become /templates/upload
+async def upload_ui(request: Request, admin_password: str, duplicates: str = None, rejected: str = None):
     return templates.TemplateResponse("template_admin.html", {
         "request": request,
-        "templates": os.listdir(UPLOAD_DIR)
+        "admin_password": admin_password,
+        "templates": os.listdir(UPLOAD_DIR),
+        "duplicates": [d.split(":", 1) for d in duplicates.split(",")] if duplicates else [],
+        "rejected": rejected.split(",") if rejected else [],
+        "duplicate_policy": DUPLICATES,
     })
 
-@router.post("/upload")
-async def handle_upload(files: list[UploadFile] = File(...)):
+@router.post("/upload", dependencies=[Depends(_check_admin)])
+async def handle_upload(admin_password: str, files: list[UploadFile] = File(...), db: Session = Depends(get_db)):
+    await run_in_threadpool(catalog.scan, db)  # index reflects what's on disk now
+    accepted = {}  # name -> hashes, for near-duplicates within this upload
+    duplicates = []
+    rejected = []
     for file in files:
-        if file.filename:
-            file_path = os.path.join(UPLOAD_DIR, file.filename)
-            with open(file_path, "wb") as f:
-                f.write(await file.read())
-    return RedirectResponse(url="/templates/upload", status_code=303)
+        name = os.path.basename(file.filename or "")
+        if not name:
+            continue
+        if not _is_image_upload(name, file.content_type):
+            rejected.append(name)
+            continue
+        data = await file.read()
+        hashes = await run_in_threadpool(phash.hashes, data)
+        if hashes is None:  # not actually an image, whatever the name says
+            rejected.append(name)
+            continue
+        original = None
+        if hashes is not None and DUPLICATES != "allow":
+            original = await run_in_threadpool(
+                template_index.find_duplicate, db, hashes, catalog.TEMPLATES_PREFIX + name
+            )
+            if original is not None:
+                original = original[len(catalog.TEMPLATES_PREFIX):]
+            else:
+                original = next((
+                    other for other, (dh, ph) in accepted.items()
+                    if phash.distance(ph, hashes[1]) <= template_index.DUPLICATE_PHASH_DISTANCE
+                    and phash.distance(dh, hashes[0]) <= template_index.DUPLICATE_DHASH_DISTANCE
+                ), None)
+
+        file_path = os.path.join(UPLOAD_DIR, name)
+        if original is not None:
+            duplicates.append(f"{name}:{original}")
+            logger.info("Duplicate template upload", extra={"file": name, "original": original, "policy": DUPLICATES})
+            if DUPLICATES == "alias" and not os.path.exists(file_path):
+                os.symlink(original, file_path)
+            continue
+
+        # Replace rather than rewrite: workers may be serving the old file from a mapping
+        tmp_path = os.path.join(UPLOAD_DIR, f".{name}.{os.getpid()}.tmp")  # dotfiles are not catalogued
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, file_path)
+        if hashes is not None:
+            accepted[name] = hashes
+    # Publish the new files to offline clients right away
+    await run_in_threadpool(catalog.scan, db)
+    url = "/templates/upload?admin_password=" + quote(admin_password)
+    if duplicates:
+        url += "&duplicates=" + quote(",".join(duplicates))
+    if rejected:
+        logger.warning("Rejected template uploads", extra={"files": rejected})
+        url += "&rejected=" + quote(",".join(rejected))
+    return RedirectResponse(url=url, status_code=303)
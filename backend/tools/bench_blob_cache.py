@@ -0,0 +1,103 @@
+"""Throughput of hot template images with and without the blob cache.
+
+Usage:
+    python -m backend.tools.bench_blob_cache [--seconds 10] [--clients 16] [--workers 2]
+
+Starts uvicorn (--workers processes, throwaway SQLite database) once with
+BLOB_CACHE_MAX_BYTES=0 and once with the default cache, and has --clients
+threads fetch the gallery's hot files (floorplan1.jpeg, elevation1.jpeg and
+the slides) in a loop. Prints requests/s, latency percentiles and the cache
+stats of one worker.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+PORT = 8766
+HOT = ["floorplan1.jpeg", "elevation1.jpeg", "slide1.gif", "slide2.gif", "slide5.png", "slide6.png"]
+COOKIES = {"session_token": "session_1", "user_email": "bench@example.com"}
+ADMIN = os.getenv("ADMIN_PASSWORD", "secret123")
+
+
+def start(workers: int, cache_bytes: str) -> subprocess.Popen:
+    env = dict(os.environ, BLOB_CACHE_MAX_BYTES=cache_bytes, CACHE_BUS="local", RATE_LIMIT_ENABLED="0",
+               RECONCILE_INTERVAL_SECONDS="0", LOG_LEVEL="WARNING",
+               DATABASE_URL=os.getenv("DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(PORT),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    for _ in range(200):
+        try:
+            requests.get(f"http://127.0.0.1:{PORT}/healthz", timeout=1)
+            return server
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    server.kill()
+    raise SystemExit("uvicorn did not start")
+
+
+def load(seconds: float, clients: int):
+    timings, done = [], threading.Event()
+    lock = threading.Lock()
+
+    def client(offset):
+        session, mine, i = requests.Session(), [], offset
+        session.cookies.update(COOKIES)
+        while not done.is_set():
+            url = f"http://127.0.0.1:{PORT}/static/templates/{HOT[i % len(HOT)]}"
+            started = time.perf_counter()
+            response = session.get(url)
+            mine.append(time.perf_counter() - started)
+            assert response.status_code == 200 and response.content
+            i += 1
+        with lock:
+            timings.extend(mine)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    done.set()
+    for t in threads:
+        t.join()
+    return sorted(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers, {args.clients} clients, {args.seconds:.0f}s per run\n")
+    print(f"{'':12} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for label, cache_bytes in (("no cache", "0"), ("blob cache", str(64 * 1024 * 1024))):
+        server = start(args.workers, cache_bytes)
+        try:
+            load(1, args.clients)  # warm up: page cache, admission
+            timings = load(args.seconds, args.clients)
+            stats = requests.get(f"http://127.0.0.1:{PORT}/admin/blob-cache",
+                                 params={"admin_password": ADMIN}, cookies=COOKIES).json()
+        finally:
+            server.terminate()
+            server.wait()
+        p99 = timings[max(int(len(timings) * 0.99) - 1, 0)]
+        print(f"{label:12} {len(timings) / args.seconds:8.0f} {statistics.median(timings) * 1000:8.2f}"
+              f" {p99 * 1000:8.2f}")
+        if stats.get("hits"):
+            print(f"{'':12} hit rate {stats['hit_rate']:.1%}, {stats['entries']} entries,"
+                  f" {stats['bytes'] / 1e6:.1f} MB mapped")
+
+
+if __name__ == "__main__":
+    main()
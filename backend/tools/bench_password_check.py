@@ -0,0 +1,53 @@
+"""Micro-benchmark for the per-keystroke /api/check-password work.
+
+Usage:
+    python -m backend.tools.bench_password_check [-n ITERATIONS]
+
+Compares the old handler body (regex recompiled per call, character scans)
+with PasswordPolicy.check(), including the Bloom filter lookup.
+"""
+import argparse
+import re
+import timeit
+
+from backend.password_policy import policy
+
+SAMPLES = ["p", "pa", "Pass", "Passw0r", "Passw0rd!", "P@ssw0rd", "Tr1cky&Long-Passphrase", "password1!"]
+
+
+def legacy_check(password):
+    password_pattern = re.compile(
+        r"^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[@$!%*?&])[A-Za-z\d@$!%*?&]{8,}$"
+    )
+    return {
+        "valid": password_pattern.match(password) is not None,
+        "rules": {
+            "length": len(password) >= 8,
+            "uppercase": any(c.isupper() for c in password),
+            "lowercase": any(c.islower() for c in password),
+            "number": any(c.isdigit() for c in password),
+            "symbol": any(c in "@$!%*?&" for c in password),
+        },
+    }
+
+
+def bench(fn, iterations):
+    total = timeit.timeit(lambda: [fn(p) for p in SAMPLES], number=iterations)
+    return total / (iterations * len(SAMPLES)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"blocklist loaded: {policy.blocklist is not None}")
+    print(f"legacy check:  {bench(legacy_check, args.iterations):7.2f} us/call")
+    print(f"policy check:  {bench(policy.check, args.iterations):7.2f} us/call")
+    if policy.blocklist is not None:
+        lookup = timeit.timeit(lambda: "Passw0rd!" in policy.blocklist, number=args.iterations)
+        print(f"filter lookup: {lookup / args.iterations * 1e6:7.2f} us/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Login lookup latency by phone at a realistic user count.
+
+Usage:
+    python -m backend.tools.bench_phone_login [--users 1000000] [-n LOOKUPS]
+
+Builds a throwaway SQLite database (unless DATABASE_URL is set) with
+--users accounts whose phones are stored in mixed formats, then times the
+/api/login user lookup three ways:
+
+  raw, unindexed   - the original `User.phone == phone` with no index
+  raw, indexed     - the same query with an index on users.phone; still
+                     misses numbers typed differently from signup
+  e164, unique     - normalize_phone() + the uq_users_phone_e164 index
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+os.environ.setdefault("CACHE_BUS", "local")
+
+from sqlalchemy import text
+
+from backend import db as backend_db
+from backend.models import Base, User
+from backend.phones import normalize_phone
+
+FORMATS = ("0{n}", "+234{n}", "+234 {a} {b} {c}", "234{n}")
+
+
+def national(i: int) -> str:
+    return f"80{i:08d}"
+
+
+def typed(i: int, rng) -> str:
+    n = national(i)
+    return rng.choice(FORMATS).format(n=n, a=n[:3], b=n[3:6], c=n[6:])
+
+
+def seed(engine, users: int, rng):
+    Base.metadata.drop_all(bind=engine, tables=[User.__table__])
+    Base.metadata.create_all(bind=engine, tables=[User.__table__])
+    batch = []
+    with engine.begin() as conn:
+        for i in range(users):
+            phone = typed(i, rng)
+            batch.append({"fullname": f"User {i}", "email": f"user{i}@example.com", "phone": phone,
+                          "phone_e164": normalize_phone(phone), "hashed_password": "x",
+                          "is_first_login": False, "used_trial": True})
+            if len(batch) == 10000:
+                conn.execute(User.__table__.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(User.__table__.insert(), batch)
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+
+
+def time_lookups(lookup, phones):
+    timings, found = [], 0
+    session = backend_db.SessionLocal()
+    try:
+        for phone in phones:
+            started = time.perf_counter()
+            user = lookup(session, phone)
+            timings.append(time.perf_counter() - started)
+            found += user is not None
+            session.expunge_all()
+    finally:
+        session.close()
+    return timings, found
+
+
+def raw_lookup(session, phone):
+    return session.query(User).filter(User.phone == phone).first()
+
+
+def e164_lookup(session, phone):
+    e164 = normalize_phone(phone)
+    return session.query(User).filter(User.phone_e164 == e164).first() if e164 else None
+
+
+def report(label, timings, found):
+    values = sorted(timings)
+    p50 = statistics.median(values) * 1000
+    p99 = values[max(int(len(values) * 0.99) - 1, 0)] * 1000
+    print(f"{label:18} {len(values):7d} {p50:10.3f} {p99:10.3f} {found / len(values):9.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("-n", "--lookups", type=int, default=2000)
+    parser.add_argument("--scan-lookups", type=int, default=50, help="lookups for the unindexed case")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    engine = backend_db.get_engine()
+    started = time.perf_counter()
+    seed(engine, args.users, rng)
+    print(f"seeded {args.users} users on {engine.dialect.name} in {time.perf_counter() - started:.1f}s\n")
+
+    # Users type their number at login in whatever format they like
+    phones = [typed(rng.randrange(args.users), rng) for _ in range(args.lookups)]
+    print(f"{'lookup':18} {'count':>7} {'p50 ms':>10} {'p99 ms':>10} {'found':>9}")
+
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX IF EXISTS ix_users_phone"))
+    report("raw, unindexed", *time_lookups(raw_lookup, phones[:args.scan_lookups]))
+
+    with engine.begin() as conn:
+        conn.execute(text("CREATE INDEX ix_users_phone ON users (phone)"))
+    report("raw, indexed", *time_lookups(raw_lookup, phones))
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_users_phone"))
+
+    report("e164, unique", *time_lookups(e164_lookup, phones))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Count sessions and pool checkouts per request, shared vs per-dependency.
+
+Usage:
+    python -m backend.tools.bench_pool_checkouts [-n REQUESTS_PER_SCENARIO]
+
+Drives the app in-process against a throwaway SQLite database (unless
+DATABASE_URL is set) and compares the request-scoped lazy session with the
+previous pattern, where every get_db dependency opened its own session.
+"""
+import argparse
+import os
+import tempfile
+from collections import Counter
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+os.environ.setdefault("CACHE_BUS", "local")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+os.environ.setdefault("ENTITLEMENT_CACHE_TTL", "0")
+
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from backend import db as backend_db
+from backend.main import app
+from backend.models import Subscription, User
+
+EMAIL = "bench@example.com"
+COOKIES = {"session_token": "session_1", "user_email": EMAIL}
+
+SCENARIOS = [
+    ("GET /ar (gated)", "get", "/ar", {}),
+    ("GET /api/check-access", "get", "/api/check-access", {}),
+    ("GET /check-subscription", "get", f"/check-subscription?email={EMAIL}", {}),
+    ("GET /check-subscription 422", "get", "/check-subscription", {}),
+    ("POST /api/update-profile 404", "post", "/api/update-profile", {"json": {"email": "nobody@example.com"}}),
+    ("POST /api/change-password", "post", "/api/change-password",
+     {"json": {"email": "nobody@example.com", "current_password": "x", "new_password": "y"}}),
+]
+
+counts = Counter()
+
+
+def legacy_get_db():
+    db = backend_db.SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def legacy_get_read_db():
+    db = backend_db.ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def seed():
+    backend_db.init_db()
+    db = backend_db.SessionLocal()
+    if not db.query(User).filter(User.email == EMAIL).first():
+        user = User(fullname="Bench", email=EMAIL, phone="08000000000", hashed_password="x")
+        db.add(user)
+        db.flush()
+        db.add(Subscription(user_id=user.id, user_email=EMAIL, is_trial=False,
+                            expiry_date=datetime.utcnow() + timedelta(days=1)))
+        db.commit()
+    db.close()
+
+
+def run(client, iterations):
+    results = {}
+    for label, method, url, kwargs in SCENARIOS:
+        counts.clear()
+        for _ in range(iterations):
+            getattr(client, method)(url, follow_redirects=False, **kwargs)
+        results[label] = (counts["session"] / iterations, counts["checkout"] / iterations)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    seed()
+    for engine in {backend_db.get_engine(), backend_db.get_read_engine()}:
+        event.listen(engine, "checkout", lambda *a: counts.update(["checkout"]))
+    original_init = Session.__init__
+
+    def counting_init(self, *a, **kw):
+        counts.update(["session"])
+        original_init(self, *a, **kw)
+
+    Session.__init__ = counting_init
+
+    with TestClient(app, cookies=COOKIES) as client:
+        client.get("/readyz")  # let the lifespan warm-up finish before counting
+        shared = run(client, args.iterations)
+        app.dependency_overrides[backend_db.get_db] = legacy_get_db
+        app.dependency_overrides[backend_db.get_read_db] = legacy_get_read_db
+        legacy = run(client, args.iterations)
+        app.dependency_overrides.clear()
+
+    print(f"{'scenario':32} {'per-dependency':>22} {'request-scoped':>22}")
+    print(f"{'':32} {'sessions  checkouts':>22} {'sessions  checkouts':>22}")
+    for label, *_ in SCENARIOS:
+        (ls, lc), (ss, sc) = legacy[label], shared[label]
+        print(f"{label:32} {ls:10.2f} {lc:10.2f} {ss:11.2f} {sc:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
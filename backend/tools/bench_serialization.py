@@ -0,0 +1,115 @@
+"""Serialization cost of a large /admin/users page.
+
+Usage:
+    python -m backend.tools.bench_serialization [--users 50000] [-n REPEATS]
+
+  serialize only  - turning the handler's return value into response bytes:
+                    plain dicts through jsonable_encoder + JSONResponse (the
+                    old path) vs the route's response model + ORJSONResponse
+  end to end      - GET /admin/users in-process on a throwaway SQLite
+                    database: the old handler (ORM objects, default JSON)
+                    vs the current one
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+os.environ.setdefault("CACHE_BUS", "local")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+
+from fastapi import Depends, FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from backend import db as backend_db
+from backend.models import Base, User
+from backend.routes import admin
+
+ADMIN = os.getenv("ADMIN_PASSWORD", "secret123")
+
+
+def seed(users: int):
+    engine = backend_db.get_engine()
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(User.__table__.delete())
+        conn.execute(User.__table__.insert(), [
+            {"fullname": f"User {i}", "email": f"user{i}@example.com", "phone": f"080{i:08d}",
+             "phone_e164": f"+23480{i:08d}", "hashed_password": "$2b$12$" + "x" * 53,
+             "is_first_login": False, "used_trial": True}
+            for i in range(users)
+        ])
+
+
+def legacy_get_users(admin_password: str, db: Session = Depends(backend_db.get_read_db)):
+    users = db.query(User).all()
+    return [
+        {
+            "id": user.id,
+            "fullname": user.fullname,
+            "phone": user.phone,
+            "email": user.email,
+            "hashed_password": user.hashed_password
+        }
+        for user in users
+    ]
+
+
+def best_of(fn, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("-n", "--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    seed(args.users)
+    rows = [
+        {"id": i + 1, "fullname": f"User {i}", "phone": f"080{i:08d}", "email": f"user{i}@example.com",
+         "hashed_password": "$2b$12$" + "x" * 53}
+        for i in range(args.users)
+    ]
+    route = next(r for r in admin.router.routes if r.path == "/admin/users")
+
+    def old_serialize():
+        return JSONResponse(jsonable_encoder(rows)).body
+
+    def new_serialize():
+        content = asyncio.run(serialize_response(field=route.response_field, response_content=rows,
+                                                 is_coroutine=True))
+        return ORJSONResponse(content).body
+
+    assert len(old_serialize()) > 0 and len(new_serialize()) > 0
+    print(f"{args.users} users, best of {args.repeats}\n")
+    print(f"{'':16} {'old ms':>10} {'new ms':>10} {'speed-up':>9}")
+    old, new = best_of(old_serialize, args.repeats), best_of(new_serialize, args.repeats)
+    print(f"{'serialize only':16} {old:10.1f} {new:10.1f} {old / new:8.1f}x")
+
+    legacy_app = FastAPI()
+    legacy_app.get("/admin/users")(legacy_get_users)
+    current_app = FastAPI(default_response_class=ORJSONResponse)
+    current_app.include_router(admin.router)
+    url = f"/admin/users?admin_password={ADMIN}"
+    with TestClient(legacy_app) as legacy, TestClient(current_app) as current:
+        assert legacy.get(url).json() == current.get(url).json()
+        old = best_of(lambda: legacy.get(url), args.repeats)
+        new = best_of(lambda: current.get(url), args.repeats)
+    print(f"{'end to end':16} {old:10.1f} {new:10.1f} {old / new:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Single-node capacity of the embedded SQLite backend.
+
+Usage:
+    python -m backend.tools.bench_sqlite [-p PROCESSES] [-t THREADS] [-s SECONDS]
+                                         [--users N] [--write-ratio R]
+
+Runs a mixed workload shaped like the app's hot paths (entitlement lookups
+and login reads on read sessions; subscription grants on the primary)
+from several processes (like gunicorn workers) and threads against a
+throwaway database file, first with the tuned configuration from
+backend/db.py, then with a stock SQLite engine (rollback journal, default
+pragmas, pysqlite transaction handling).
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+os.environ.pop("DATABASE_URL", None)
+os.environ.pop("DATABASE_REPLICA_URL", None)
+os.environ.setdefault("CACHE_BUS", "local")
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from backend import db as backend_db
+from backend.models import Base, Subscription, User
+
+
+def seed(path: str, users: int):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {"fullname": f"User {i}", "email": f"user{i}@example.com", "phone": f"080{i:08d}",
+             "hashed_password": "x", "is_first_login": False, "used_trial": True}
+            for i in range(users)
+        ])
+        conn.execute(Subscription.__table__.insert(), [
+            {"user_id": i + 1, "user_email": f"user{i}@example.com", "is_trial": True,
+             "expiry_date": now + timedelta(days=1), "created_at": now, "is_active": True,
+             "amount_paid": 0.0}
+            for i in range(0, users, 2)
+        ])
+    engine.dispose()
+
+
+def entitlement_read(session, email):
+    session.query(Subscription).filter(
+        Subscription.user_email == email,
+        Subscription.expiry_date > datetime.utcnow()
+    ).order_by(Subscription.expiry_date.desc()).first()
+
+
+def login_read(session, email):
+    session.query(User).filter(User.email == email).first()
+
+
+def grant(session, email, user_id):
+    session.add(Subscription(user_id=user_id, user_email=email, is_trial=False, amount_paid=300.0,
+                             expiry_date=datetime.utcnow() + timedelta(days=1)))
+    user = session.get(User, user_id)
+    user.last_subscription_date = datetime.utcnow()
+    session.commit()
+
+
+def run(read_factory, write_factory, threads, seconds, users, write_ratio):
+    latencies = {"read": [], "write": []}
+    errors = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(seed_value):
+        rng = random.Random(seed_value)
+        local = {"read": [], "write": []}
+        failed = 0
+        while time.perf_counter() < deadline:
+            i = rng.randrange(users)
+            email = f"user{i}@example.com"
+            kind = "write" if rng.random() < write_ratio else "read"
+            session = write_factory() if kind == "write" else read_factory()
+            started = time.perf_counter()
+            try:
+                if kind == "write":
+                    grant(session, email, i + 1)
+                else:
+                    entitlement_read(session, email)
+                    login_read(session, email)
+                local[kind].append(time.perf_counter() - started)
+            except OperationalError:
+                session.rollback()
+                failed += 1
+            finally:
+                session.close()
+        with lock:
+            for key in local:
+                latencies[key].extend(local[key])
+            errors.append(failed)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return latencies, sum(errors)
+
+
+def _process(mode, path, args, results):
+    if mode == "tuned":
+        backend_db.SQLITE_PATH = path
+        backend_db.dispose_engine()
+        read_factory, write_factory = backend_db.ReadSessionLocal, backend_db.SessionLocal
+    else:
+        stock = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False},
+                              pool_size=args.threads, max_overflow=0)
+        read_factory = write_factory = sessionmaker(bind=stock, autoflush=False)
+    results.put(run(read_factory, write_factory, args.threads, args.seconds, args.users, args.write_ratio))
+
+
+def run_processes(mode, path, args):
+    seed(path, args.users)
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=_process, args=(mode, path, args, results))
+             for _ in range(args.processes)]
+    for p in procs:
+        p.start()
+    latencies, errors = {"read": [], "write": []}, 0
+    for _ in procs:
+        part, failed = results.get()
+        for key in latencies:
+            latencies[key].extend(part[key])
+        errors += failed
+    for p in procs:
+        p.join()
+    return latencies, errors
+
+
+def report(label, latencies, errors, seconds):
+    print(label)
+    for kind in ("read", "write"):
+        values = sorted(latencies[kind])
+        if not values:
+            print(f"  {kind:5}: no operations")
+            continue
+        p50 = statistics.median(values) * 1000
+        p99 = values[int(len(values) * 0.99) - 1] * 1000
+        print(f"  {kind:5}: {len(values) / seconds:9.0f} ops/s   p50 {p50:7.2f} ms   p99 {p99:7.2f} ms")
+    print(f"  errors (database is locked): {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-p", "--processes", type=int, default=4)
+    parser.add_argument("-t", "--threads", type=int, default=4)
+    parser.add_argument("-s", "--seconds", type=float, default=10)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    print(f"{args.processes} processes x {args.threads} threads, {args.seconds:g}s each, "
+          f"{args.users} users, {args.write_ratio:.0%} writes\n")
+
+    latencies, errors = run_processes("tuned", os.path.join(workdir, "tuned.db"), args)
+    report("tuned: WAL, IMMEDIATE on first write, reader pool", latencies, errors, args.seconds)
+    latencies, errors = run_processes("stock", os.path.join(workdir, "stock.db"), args)
+    report("stock: rollback journal, default pragmas", latencies, errors, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
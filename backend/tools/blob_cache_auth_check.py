@@ -0,0 +1,76 @@
+"""Check that a blob cache hit never bypasses the access checks on /static.
+
+Usage:
+    python -m backend.tools.blob_cache_auth_check
+
+Runs the app in-process against a throwaway SQLite database, warms the blob
+cache with a signed-in client, then requests each file once per credential
+case with the cache on and once with it off. The responses must agree:
+a case the regular stack turns away (redirect to /login) must never get a
+200 from the cache. Prints one line per case and exits 1 on any mismatch.
+"""
+import os
+import sys
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/auth_check.db")
+os.environ.setdefault("CACHE_BUS", "local")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+os.environ.setdefault("RECONCILE_INTERVAL_SECONDS", "0")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from fastapi.testclient import TestClient
+
+from backend import blob_cache
+from backend.main import app
+
+PATHS = ["/static/templates/floorplan1.jpeg", "/static/templates/slide5.png"]
+SIGNED_IN = {"session_token": "session_1", "user_email": "check@example.com"}
+CASES = [
+    ("no cookies", {}, ""),
+    ("session token only", {"session_token": "session_1"}, ""),
+    ("email cookie only", {"user_email": "check@example.com"}, ""),
+    ("email query only", {}, "?email=check@example.com"),
+    ("empty session token", {"session_token": "", "user_email": "check@example.com"}, ""),
+    ("foreign session token", {"session_token": "abc", "user_email": "check@example.com"}, ""),
+    ("session token + email query", {"session_token": "session_1"}, "?email=check@example.com"),
+    ("signed in", SIGNED_IN, ""),
+]
+
+
+def fetch(client: TestClient, path: str, cookies: dict, query: str):
+    client.cookies.clear()
+    client.cookies.update(cookies)
+    response = client.get(path + query)
+    return response.status_code, response.headers.get("location")
+
+
+def main():
+    cache = blob_cache.cache
+    failures = 0
+    with TestClient(app, follow_redirects=False) as client:
+        for path in PATHS:
+            for _ in range(cache.admit_after + 1):
+                fetch(client, path, SIGNED_IN, "")
+            if cache.get(path[len(blob_cache.URL_PREFIX):]) is None:
+                print(f"{path}: not admitted to the blob cache, nothing to check")
+                failures += 1
+                continue
+
+            for label, cookies, query in CASES:
+                cached = fetch(client, path, cookies, query)
+                max_bytes, cache.max_bytes = cache.max_bytes, 0
+                try:
+                    uncached = fetch(client, path, cookies, query)
+                finally:
+                    cache.max_bytes = max_bytes
+                ok = cached == uncached
+                failures += not ok
+                print(f"{'ok ' if ok else 'FAIL'} {path:36} {label:28} cache {cached[0]}  stack {uncached[0]}")
+
+    print(f"\n{failures} mismatch(es)" if failures else "\ncache hits agree with the stack")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
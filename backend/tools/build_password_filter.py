@@ -0,0 +1,46 @@
+"""Rebuild the common/breached password Bloom filter.
+
+Usage:
+    python -m backend.tools.build_password_filter [wordlist ...] [-o OUT] [--fp-rate 0.001]
+
+Word lists are plain text, one password per line; blank lines and lines
+starting with '#' are skipped. Defaults to backend/data/common_passwords.txt.
+"""
+import argparse
+import os
+from pathlib import Path
+
+from backend.password_policy import DEFAULT_FILTER_PATH, BloomFilter
+
+DEFAULT_WORDLIST = Path(__file__).parent.parent / "data" / "common_passwords.txt"
+
+
+def read_words(paths):
+    for path in paths:
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                word = line.rstrip("\r\n")
+                if word and not word.startswith("#"):
+                    yield word
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("wordlists", nargs="*", default=[str(DEFAULT_WORDLIST)])
+    parser.add_argument("-o", "--output", default=str(DEFAULT_FILTER_PATH))
+    parser.add_argument("--fp-rate", type=float, default=0.001)
+    args = parser.parse_args()
+
+    words = set(w.lower() for w in read_words(args.wordlists))
+    data = BloomFilter.build(words, capacity=len(words), fp_rate=args.fp_rate)
+
+    # Write-then-rename so running workers keep their old mapping intact.
+    tmp = f"{args.output}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, args.output)
+    print(f"Wrote {args.output}: {len(words)} words, {len(data)} bytes")
+
+
+if __name__ == "__main__":
+    main()
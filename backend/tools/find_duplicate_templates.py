@@ -0,0 +1,35 @@
+"""List near-duplicate files already in static/templates.
+
+Usage:
+    python -m backend.tools.find_duplicate_templates [--similar]
+
+Uses the same hashes and thresholds as upload-time detection
+(backend/template_index.py). With --similar, also lists pairs within the
+looser "similar plans" distance.
+"""
+import argparse
+
+from backend import catalog, phash, template_index
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--similar", action="store_true")
+    args = parser.parse_args()
+
+    limit = template_index.SIMILAR_DISTANCE if args.similar else template_index.DUPLICATE_PHASH_DISTANCE
+    tree, hashes = phash.BKTree(), {}
+    for path in sorted((catalog.STATIC_DIR / "templates").iterdir()):
+        found = phash.hashes(path.read_bytes()) if path.is_file() else None
+        if found is None:
+            continue
+        for d, other in tree.search(found[1], limit):
+            dh = phash.distance(hashes[other][0], found[0])
+            duplicate = d <= template_index.DUPLICATE_PHASH_DISTANCE and dh <= template_index.DUPLICATE_DHASH_DISTANCE
+            print(f"{'duplicate' if duplicate else 'similar':9}  {other:24} {path.name:24} phash {d:2d}  dhash {dh:2d}")
+        hashes[path.name] = found
+        tree.add(found[1], path.name)
+
+
+if __name__ == "__main__":
+    main()
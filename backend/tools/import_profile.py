@@ -0,0 +1,70 @@
+"""Report what `import backend.main` costs at cold start.
+
+Usage:
+    python -m backend.tools.import_profile [--module backend.main] [--top 20] [--budget-ms 1500]
+
+Runs the import in a fresh interpreter with `-X importtime`, prints the
+slowest modules by cumulative time, and exits non-zero when the total
+exceeds --budget-ms so CI can catch cold-start regressions. The import
+must not touch the database; DATABASE_URL is left unset by default to
+prove it.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+
+def profile_import(module: str, env: dict):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3:
+            continue
+        name = fields[2]
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(fields[0]), int(fields[1]), depth, name.strip()))
+    return proc.returncode, proc.stderr, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="backend.main")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    parser.add_argument("--keep-database-url", action="store_true",
+                        help="pass DATABASE_URL through instead of unsetting it")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if not args.keep_database_url:
+        env.pop("DATABASE_URL", None)
+
+    code, stderr, rows = profile_import(args.module, env)
+    if code != 0:
+        print(stderr.splitlines()[-1] if stderr else "import failed", file=sys.stderr)
+        print(f"import {args.module} failed (exit {code})", file=sys.stderr)
+        sys.exit(code)
+
+    top_level = [r for r in rows if r[2] == 1]
+    total_ms = sum(r[1] for r in top_level) / 1000
+
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for self_us, cumulative_us, _, name in sorted(rows, key=lambda r: r[1], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:14.1f} {self_us / 1000:9.1f}  {name}")
+    print(f"\ntotal import time for {args.module}: {total_ms:.1f} ms ({len(rows)} modules)")
+
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"over budget: {total_ms:.1f} ms > {args.budget_ms:.1f} ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Schema migrations.
+
+Usage:
+    python -m backend.tools.migrate status
+    python -m backend.tools.migrate upgrade [--target VERSION] [--dry-run]
+    python -m backend.tools.migrate stamp [VERSION]
+"""
+import argparse
+
+from backend import migrations
+from backend.db import get_engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status")
+    up = sub.add_parser("upgrade")
+    up.add_argument("--target")
+    up.add_argument("--dry-run", action="store_true", help="log the SQL without running it")
+    st = sub.add_parser("stamp")
+    st.add_argument("version", nargs="?")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    if args.command == "status":
+        for version, description, applied_at in migrations.status(engine):
+            state = applied_at.isoformat(timespec="seconds") if applied_at else "pending"
+            print(f"{version}  {state:20}  {description}")
+    elif args.command == "upgrade":
+        done = migrations.upgrade(engine, target=args.target, dry_run=args.dry_run)
+        print(f"Applied: {', '.join(done)}" if done else "Already up to date")
+    elif args.command == "stamp":
+        migrations.stamp(engine, args.version)
+        print("Stamped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Local stand-in for the parts of the Paystack API the backend uses.
+
+Usage:
+    python -m backend.tools.paystack_stub [--port 9090] [--latency S] [--error-rate R] [--hang-rate R]
+    PAYSTACK_API_BASE=http://127.0.0.1:9090 uvicorn backend.main:app
+
+Endpoints:
+    POST /transaction/initialize        records the reference as "abandoned"
+    GET  /transaction/verify/<ref>      returns the stored transaction
+    GET  /transaction?from&to&page&perPage
+    POST /_stub/settle/<ref>?status=success   simulate the customer paying
+    POST /_stub/faults?latency=2&error_rate=0.5&hang_rate=0&status=503
+                                        change injected faults at runtime
+
+Faults apply to every /transaction call: `latency` seconds of delay, then
+a `status` error response with probability error_rate, or with probability
+hang_rate no response at all for 60s (a gateway that accepts connections
+but never answers).
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+transactions = {}  # reference -> transaction dict
+faults = {"latency": 0.0, "error_rate": 0.0, "hang_rate": 0.0, "status": 503}
+_lock = threading.Lock()
+
+
+def _parse_time(value):
+    return datetime.fromisoformat(value.rstrip("Z")) if value else None
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def _send(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up during an injected stall
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _inject_faults(self) -> bool:
+        """Apply the configured faults; True if the request was answered with one."""
+        with _lock:
+            current = dict(faults)
+        if current["latency"]:
+            time.sleep(current["latency"])
+        roll = random.random()
+        if roll < current["hang_rate"]:
+            time.sleep(60)
+            return True
+        if roll < current["hang_rate"] + current["error_rate"]:
+            self._send(int(current["status"]), {"status": False, "message": "Injected fault"})
+            return True
+        return False
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path == "/_stub/faults":
+            query = parse_qs(url.query)
+            with _lock:
+                for key in faults:
+                    if key in query:
+                        faults[key] = float(query[key][0])
+                current = dict(faults)
+            return self._send(200, {"status": True, "faults": current})
+        if url.path.startswith("/transaction") and self._inject_faults():
+            return
+        if url.path == "/transaction/initialize":
+            payload = self._body()
+            reference = payload["reference"]
+            with _lock:
+                transactions[reference] = {
+                    "id": len(transactions) + 1,
+                    "reference": reference,
+                    "amount": payload["amount"],
+                    "status": "abandoned",
+                    "customer": {"email": payload["email"]},
+                    "created_at": datetime.utcnow().isoformat() + "Z",
+                }
+            return self._send(200, {"status": True, "data": {
+                "authorization_url": f"http://{self.headers['Host']}/checkout/{reference}",
+                "reference": reference,
+            }})
+        if url.path.startswith("/_stub/settle/"):
+            reference = url.path.rsplit("/", 1)[-1]
+            status = parse_qs(url.query).get("status", ["success"])[0]
+            with _lock:
+                if reference not in transactions:
+                    return self._send(404, {"status": False, "message": "Transaction reference not found"})
+                transactions[reference]["status"] = status
+            return self._send(200, {"status": True})
+        self._send(404, {"status": False, "message": "Not found"})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.startswith("/transaction") and self._inject_faults():
+            return
+        if url.path.startswith("/transaction/verify/"):
+            reference = url.path.rsplit("/", 1)[-1]
+            with _lock:
+                tx = transactions.get(reference)
+            if tx is None:
+                return self._send(400, {"status": False, "message": "Transaction reference not found"})
+            return self._send(200, {"status": True, "data": tx})
+        if url.path == "/transaction":
+            query = parse_qs(url.query)
+            start = _parse_time(query.get("from", [None])[0])
+            end = _parse_time(query.get("to", [None])[0])
+            page = int(query.get("page", ["1"])[0])
+            per_page = int(query.get("perPage", ["50"])[0])
+            with _lock:
+                matching = [
+                    tx for tx in transactions.values()
+                    if (start is None or _parse_time(tx["created_at"]) >= start)
+                    and (end is None or _parse_time(tx["created_at"]) <= end)
+                ]
+            page_count = max(1, -(-len(matching) // per_page))
+            data = matching[(page - 1) * per_page:page * per_page]
+            return self._send(200, {"status": True, "data": data, "meta": {
+                "total": len(matching), "page": page, "perPage": per_page, "pageCount": page_count,
+            }})
+        self._send(404, {"status": False, "message": "Not found"})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port: int = 9090, **fault_settings) -> ThreadingHTTPServer:
+    faults.update(fault_settings)
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=9090)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    faults.update(latency=args.latency, error_rate=args.error_rate, hang_rate=args.hang_rate)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), StubHandler)
+    server.daemon_threads = True
+    print(f"Paystack stub listening on http://127.0.0.1:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
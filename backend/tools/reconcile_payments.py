@@ -0,0 +1,24 @@
+"""Settle pending Paystack references now instead of waiting for the job.
+
+Usage:
+    python -m backend.tools.reconcile_payments [--window-hours 48]
+
+Set PAYSTACK_API_BASE=http://127.0.0.1:9090 to run against
+backend/tools/paystack_stub.py.
+"""
+import argparse
+
+from backend.reconcile import WINDOW_HOURS, reconcile_once
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--window-hours", type=int, default=WINDOW_HOURS)
+    args = parser.parse_args()
+
+    counts = reconcile_once(args.window_hours)
+    print("Reconciled:", ", ".join(f"{k}={v}" for k, v in sorted(counts.items())) or "nothing pending")
+
+
+if __name__ == "__main__":
+    main()
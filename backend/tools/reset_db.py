@@ -1,8 +1,9 @@
-from backend.db import engine
+from backend.db import get_engine
 from backend.models import Base
 
 # ⚠️ WARNING: This will delete all tables and recreate them from scratch.
 print("Resetting database...")
+engine = get_engine()
 
 Base.metadata.drop_all(bind=engine)
 Base.metadata.create_all(bind=engine)
@@ -0,0 +1,108 @@
+"""Local SMTP stand-in for the mailer, with injectable faults.
+
+Usage:
+    python -m backend.tools.smtp_stub [--port 2525] [--latency S] [--error-rate R] [--drop-rate R]
+    SMTP_SERVER=127.0.0.1 SMTP_PORT=2525 SMTP_STARTTLS=0 python -m backend.worker
+
+Accepts any login and keeps delivered messages in memory (`messages`).
+Faults apply per connection: `latency` seconds before the greeting, then
+with probability error_rate a 451 on MAIL FROM, or with probability
+drop_rate the connection is closed without a greeting.
+"""
+import argparse
+import random
+import socketserver
+import threading
+import time
+
+messages = []  # (sender, [recipients], data)
+faults = {"latency": 0.0, "error_rate": 0.0, "drop_rate": 0.0}
+_lock = threading.Lock()
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line: str):
+        self.wfile.write((line + "\r\n").encode("ascii"))
+
+    def handle(self):
+        with _lock:
+            current = dict(faults)
+        if current["latency"]:
+            time.sleep(current["latency"])
+        roll = random.random()
+        if roll < current["drop_rate"]:
+            return
+        failing = roll < current["drop_rate"] + current["error_rate"]
+
+        self._reply("220 smtp-stub ESMTP")
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("ascii", "replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self._reply("250-smtp-stub")
+                self._reply("250 AUTH PLAIN LOGIN")
+            elif verb == "AUTH":
+                self._reply("235 2.7.0 Authentication successful")
+            elif verb == "MAIL":
+                if failing:
+                    self._reply("451 4.3.0 Injected fault, try again later")
+                    continue
+                sender, recipients = command[10:].strip("<> "), []
+                self._reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command[8:].strip("<> "))
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                body = []
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data == b".\r\n":
+                        break
+                    body.append(data)
+                with _lock:
+                    messages.append((sender, recipients, b"".join(body)))
+                self._reply("250 OK queued")
+            elif verb == "RSET":
+                sender, recipients = None, []
+                self._reply("250 OK")
+            elif verb == "NOOP":
+                self._reply("250 OK")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+def serve(port: int = 2525, **fault_settings) -> socketserver.ThreadingTCPServer:
+    faults.update(fault_settings)
+    server = _Server(("127.0.0.1", port), SMTPHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    faults.update(latency=args.latency, error_rate=args.error_rate, drop_rate=args.drop_rate)
+    server = _Server(("127.0.0.1", args.port), SMTPHandler)
+    print(f"SMTP stub listening on 127.0.0.1:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Fault drill: the app against a failing Paystack and SMTP stand-in.
+
+Usage:
+    python -m backend.tools.upstream_drill [--users 40] [--latency 5]
+
+Starts the Paystack and SMTP stubs and the app (uvicorn, one worker) on
+local ports with a throwaway SQLite database, then runs three phases of
+concurrent /initiate-payment calls while polling /healthz:
+
+  healthy   - stubs answer normally
+  degraded  - stubs stall past the client timeouts, then answer 503/451;
+              the Paystack breaker should open and later calls get 503 at once
+  recovered - faults cleared; after the reset timeout one half-open probe
+              closes the breaker again
+
+A final step sends OTP emails through the job handler against a failing
+SMTP stub to show the SMTP breaker opening. Prints latency and status
+counts per phase plus breaker snapshots.
+"""
+import argparse
+import collections
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PAYSTACK_PORT, SMTP_PORT, APP_PORT = 9091, 2526, 8765
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/drill.db")
+os.environ.setdefault("CACHE_BUS", "local")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+os.environ.setdefault("RECONCILE_INTERVAL_SECONDS", "0")
+os.environ["PAYSTACK_API_BASE"] = f"http://127.0.0.1:{PAYSTACK_PORT}"
+os.environ.setdefault("PAYSTACK_READ_TIMEOUT", "2")
+os.environ.setdefault("PAYSTACK_BREAKER_RESET_SECONDS", "3")
+os.environ.update(SMTP_SERVER="127.0.0.1", SMTP_PORT=str(SMTP_PORT), SMTP_STARTTLS="0", SMTP_TIMEOUT="2",
+                  EMAIL_SENDER="drill@example.com", EMAIL_PASSWORD="x", SMTP_BREAKER_RESET_SECONDS="3")
+
+import requests
+import uvicorn
+
+from backend import mailer, resilience
+from backend.tools import paystack_stub, smtp_stub
+
+COOKIES = {"session_token": "session_1", "user_email": "drill@example.com"}
+
+
+def start_app():
+    from backend.main import app
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=APP_PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    base = f"http://127.0.0.1:{APP_PORT}"
+    for _ in range(100):
+        try:
+            requests.get(f"{base}/readyz", timeout=1)
+            return base
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    raise SystemExit("app did not start")
+
+
+def pay(base):
+    started = time.perf_counter()
+    try:
+        status = requests.post(f"{base}/initiate-payment", json={"email": COOKIES["user_email"]},
+                               cookies=COOKIES, timeout=30).status_code
+    except requests.RequestException:
+        status = "error"
+    return status, time.perf_counter() - started
+
+
+def phase(label, base, users):
+    health, stop = [], threading.Event()
+
+    def poll_health():
+        while not stop.is_set():
+            started = time.perf_counter()
+            requests.get(f"{base}/healthz", timeout=30)
+            health.append(time.perf_counter() - started)
+            time.sleep(0.05)
+
+    poller = threading.Thread(target=poll_health)
+    poller.start()
+    with ThreadPoolExecutor(users) as pool:
+        results = list(pool.map(lambda _: pay(base), range(users * 3)))
+    stop.set()
+    poller.join()
+
+    latencies = sorted(r[1] for r in results)
+    statuses = collections.Counter(r[0] for r in results)
+    print(f"{label:10} pay p50 {statistics.median(latencies) * 1000:7.0f}ms  max {latencies[-1] * 1000:7.0f}ms"
+          f"  healthz max {max(health) * 1000:5.0f}ms  {dict(statuses)}")
+    print(f"{'':10} paystack breaker: {resilience.paystack.snapshot()['state']}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=40, help="concurrent clients")
+    parser.add_argument("--latency", type=float, default=5.0, help="stub stall in the degraded phase (s)")
+    args = parser.parse_args()
+
+    paystack_stub.serve(PAYSTACK_PORT)
+    smtp_stub.serve(SMTP_PORT)
+    base = start_app()
+
+    phase("healthy", base, args.users)
+    paystack_stub.faults.update(latency=args.latency)
+    phase("degraded", base, args.users)
+    paystack_stub.faults.update(latency=0.0, error_rate=1.0)
+    phase("", base, args.users)
+
+    paystack_stub.faults.update(error_rate=0.0)
+    time.sleep(resilience.paystack.reset_seconds)
+    phase("recovered", base, args.users)
+
+    print("\nsmtp, stub failing every MAIL FROM:")
+    smtp_stub.faults.update(error_rate=1.0)
+    for attempt in range(resilience.smtp.failure_threshold + 2):
+        started = time.perf_counter()
+        try:
+            mailer.send_email_otp("user@example.com", "123456")
+            outcome = "sent"
+        except Exception as e:
+            outcome = type(e).__name__
+        print(f"  attempt {attempt + 1}: {outcome:22} {(time.perf_counter() - started) * 1000:6.1f}ms"
+              f"  breaker {resilience.smtp.snapshot()['state']}")
+    smtp_stub.faults.update(error_rate=0.0)
+    time.sleep(resilience.smtp.reset_seconds)
+    mailer.send_email_otp("user@example.com", "123456")
+    print(f"  after reset: sent, breaker {resilience.smtp.snapshot()['state']}, "
+          f"{len(smtp_stub.messages)} message(s) delivered")
+
+    print("\n" + resilience.prometheus())
+
+
+if __name__ == "__main__":
+    main()
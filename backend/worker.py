@@ -0,0 +1,35 @@
+"""Job worker entrypoint: python -m backend.worker
+
+Runs queued jobs (see backend/jobs.py) outside the web processes, so they
+survive deploys and never compete with request handling.
+
+Environment:
+  JOB_CONCURRENCY   - jobs run at once by this process (default 4)
+  JOB_POLL_SECONDS  - idle polling interval (default 1)
+"""
+import importlib
+import signal
+
+from backend import jobs
+from backend.db import dispose_engine, init_db
+from backend.logs import setup_logging, shutdown_logging
+
+
+def main():
+    setup_logging()
+    for module in jobs.HANDLER_MODULES:
+        importlib.import_module(module)
+    init_db()
+
+    worker = jobs.Worker()
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    signal.signal(signal.SIGINT, lambda *_: worker.stop())
+    try:
+        worker.run()
+    finally:
+        dispose_engine()
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    main()
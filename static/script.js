@@ -236,18 +236,55 @@ const imageThumbnails = document.getElementById('image-thumbnails');
 const addImageBtn = document.getElementById('add-image-btn');
 let currentActiveImage = null;
 
+// Line art is on unless the user opts out (the #lineart-toggle checkbox, or
+// localStorage 'lineArt' = 'off'); the original photo is always kept.
+const lineArtToggle = document.getElementById('lineart-toggle');
+
+function lineArtEnabled() {
+  return lineArtToggle ? lineArtToggle.checked : localStorage.getItem('lineArt') !== 'off';
+}
+
+if (lineArtToggle) {
+  lineArtToggle.checked = localStorage.getItem('lineArt') !== 'off';
+  lineArtToggle.addEventListener('change', () => {
+    localStorage.setItem('lineArt', lineArtToggle.checked ? 'on' : 'off');
+    if (currentActiveImage) currentActiveImage.click();
+  });
+}
+
+// Ask the server for a light transparent line-art version of a photographed plan.
+// Resolves to null (use the original photo) if the server can't process it.
+async function fetchLineArt(file) {
+  try {
+    const form = new FormData();
+    form.append('file', file);
+    const response = await fetch('/api/lineart', { method: 'POST', body: form, credentials: 'include' });
+    if (!response.ok) return null;
+    const result = await response.json();
+    return result.url;
+  } catch (err) {
+    console.warn('Line-art extraction unavailable, using original image:', err);
+    return null;
+  }
+}
+
 // Modified upload handler
 function handleImageUpload(file) {
   const reader = new FileReader();
-  reader.onload = () => {
+  reader.onload = async () => {
+    const originalSrc = reader.result;
+    const lineArtSrc = lineArtEnabled() ? await fetchLineArt(file) : null;
+    const currentSrc = () => (lineArtEnabled() && lineArtSrc) || originalSrc;
+
     // Create thumbnail
     const thumbnail = document.createElement('img');
     thumbnail.className = 'thumbnail';
-    thumbnail.src = reader.result;
+    thumbnail.src = currentSrc();
     
     // Add click handler for thumbnail
     thumbnail.addEventListener('click', () => {
-      overlay.src = reader.result;
+      thumbnail.src = currentSrc();
+      overlay.src = currentSrc();
       overlay.style.display = 'block';
       
       if (currentActiveImage) {
@@ -440,7 +477,7 @@ window.addEventListener('DOMContentLoaded', () => {
         localStorage.removeItem('selectedTemplate');
     }
 });
-
+
 //PWA
 // Register Service Worker
 if ('serviceWorker' in navigator) {
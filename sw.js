@@ -1,4 +1,8 @@
-const CACHE_NAME = "architrace-cache-v1";
+const CACHE_NAME = "architrace-cache-v2";
+// Templates and tutorials live in their own cache, kept current by syncCatalog()
+const CATALOG_CACHE = "architrace-catalog";
+const CATALOG_CURSOR_KEY = "/__catalog-cursor";
+const CATALOG_SYNC_INTERVAL_MS = 5 * 60 * 1000;
 const urlsToCache = [
   "/",
   "/index.html",
@@ -25,8 +29,70 @@ self.addEventListener("install", event => {
   );
 });
 
+// Hex SHA-256 of a response body, to check downloads against the catalog
+async function sha256Hex(response) {
+  const digest = await crypto.subtle.digest("SHA-256", await response.arrayBuffer());
+  return Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, "0")).join("");
+}
+
+async function readCursor(cache) {
+  const stored = await cache.match(CATALOG_CURSOR_KEY);
+  return stored ? parseInt(await stored.text(), 10) || 0 : 0;
+}
+
+// Fetch only the catalog entries added, changed or removed since our cursor
+let catalogSync = null;
+let lastCatalogSync = 0;
+
+async function runCatalogSync() {
+  const cache = await caches.open(CATALOG_CACHE);
+  const since = await readCursor(cache);
+  const response = await fetch(`/api/catalog?since=${since}`, { credentials: "include", cache: "no-store" });
+  if (!response.ok || response.redirected) return;  // offline or logged out: keep what we have
+  const delta = await response.json();
+
+  if (delta.reset) {
+    const live = new Set(delta.items.map(item => new URL(item.url, self.location.origin).href));
+    for (const request of await cache.keys()) {
+      if (!live.has(request.url) && !request.url.endsWith(CATALOG_CURSOR_KEY)) await cache.delete(request);
+    }
+  }
+
+  for (const item of delta.items) {
+    if (item.deleted) {
+      await cache.delete(item.url);
+      continue;
+    }
+    const cached = await cache.match(item.url);
+    if (cached && await sha256Hex(cached.clone()) === item.sha256) continue;
+    const fresh = await fetch(item.url, { cache: "reload" });
+    if (!fresh.ok) return;  // leave the cursor alone so the next sync retries
+    if (await sha256Hex(fresh.clone()) !== item.sha256) return;  // changed again mid-sync
+    await cache.put(item.url, fresh);
+  }
+
+  await cache.put(CATALOG_CURSOR_KEY, new Response(String(delta.cursor)));
+}
+
+function syncCatalog() {
+  if (!catalogSync) {
+    lastCatalogSync = Date.now();
+    catalogSync = runCatalogSync()
+      .catch(err => console.warn("Catalog sync failed:", err))
+      .finally(() => { catalogSync = null; });
+  }
+  return catalogSync;
+}
+
+self.addEventListener("message", event => {
+  if (event.data === "sync-catalog") event.waitUntil(syncCatalog());
+});
+
 // Fetch from cache or network
 self.addEventListener("fetch", event => {
+  if (event.request.mode === "navigate" && Date.now() - lastCatalogSync > CATALOG_SYNC_INTERVAL_MS) {
+    event.waitUntil(syncCatalog());
+  }
   event.respondWith(
     caches.match(event.request).then(response => {
       return response || fetch(event.request);
@@ -40,9 +106,9 @@ self.addEventListener("activate", event => {
     caches.keys().then(cacheNames => {
       return Promise.all(
         cacheNames
-          .filter(name => name !== CACHE_NAME)
+          .filter(name => name !== CACHE_NAME && name !== CATALOG_CACHE)
           .map(name => caches.delete(name))
       );
-    })
+    }).then(() => syncCatalog())
   );
 });